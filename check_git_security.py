@@ -7,90 +7,179 @@ Verifies that confidential files are properly ignored by Git
 import os
 import subprocess
 import sys
+from functools import lru_cache
 from pathlib import Path
 
+CONFIDENTIAL_FILES = [
+    '.env',
+    'credentials.json', 
+    'token.json',
+    'data/email_agent.db',
+    '.env.backup',
+    'credentials.json.backup',
+    'token.json.backup'
+]
+
+# Full paths, basenames and parent directories (git status collapses untracked
+# directories to "dir/"), so each status entry is a constant-time lookup
+CONFIDENTIAL_NAMES = (
+    frozenset(CONFIDENTIAL_FILES)
+    | {os.path.basename(name) for name in CONFIDENTIAL_FILES}
+    | {os.path.dirname(name) + '/' for name in CONFIDENTIAL_FILES if os.path.dirname(name)}
+)
+
+# Checked verbatim in .gitignore only when git itself is unavailable
+REQUIRED_GITIGNORE_PATTERNS = [
+    '.env',
+    'credentials.json',
+    'token.json',
+    '*.db'
+]
+
+def _iter_nul_records(stream, chunk_size=8192):
+    """Yield NUL-terminated records from a binary stream as they arrive"""
+    pending = b''
+    while True:
+        chunk = stream.read1(chunk_size)
+        if not chunk:
+            break
+        pending += chunk
+        *records, pending = pending.split(b'\0')
+        yield from records
+    if pending:
+        yield pending
+
+def _unignored_paths(paths, no_index=False):
+    """Return the paths git's ignore rules do not match, in one check-ignore call"""
+    # Let git apply the full ignore rules (negations, directory patterns, nested
+    # .gitignore files); without no_index, tracked files are reported as non-matching
+    args = ['git', 'check-ignore', '--stdin', '-z', '--verbose', '--non-matching']
+    if no_index:
+        args.append('--no-index')
+    result = subprocess.run(args, input='\0'.join(paths) + '\0', capture_output=True, text=True)
+    if result.returncode not in (0, 1):
+        raise subprocess.CalledProcessError(result.returncode, result.args)
+    
+    # Records are source, line number, pattern, path; a path whose last
+    # matching pattern is a negation ("!name") is reported but not ignored
+    fields = result.stdout.split('\0')
+    return [
+        path for source, pattern, path in zip(fields[0::4], fields[2::4], fields[3::4])
+        if not source or pattern.startswith('!')
+    ]
+
+def _unignored_confidential_files():
+    """Return confidential files on disk that git does not ignore (or already tracks)"""
+    candidates = [name for name in CONFIDENTIAL_FILES if os.path.exists(name)]
+    if not candidates:
+        return []
+    return _unignored_paths(candidates)
+
+def _confidential_status_entries():
+    """Return confidential paths reported by git status, stopping at the first hit"""
+    # Stream NUL-separated status records instead of buffering the whole output
+    proc = subprocess.Popen(['git', 'status', '--porcelain', '-z'],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    
+    found_confidential = []
+    try:
+        records = _iter_nul_records(proc.stdout)
+        for record in records:
+            status, filename = record[:2], record[3:].decode('utf-8', 'replace')
+            if status[0:1] in (b'R', b'C'):
+                next(records, None)  # Skip the original path of a rename/copy
+            if filename in CONFIDENTIAL_NAMES or os.path.basename(filename) in CONFIDENTIAL_NAMES:
+                found_confidential.append(filename)
+                proc.terminate()
+                break
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+    
+    if not found_confidential and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, proc.args)
+    
+    return found_confidential
+
 def check_git_status():
     """Check if confidential files appear in git status"""
-    print("🔍 Checking Git status for confidential files...")
-    
-    confidential_files = [
-        '.env',
-        'credentials.json', 
-        'token.json',
-        'data/email_agent.db',
-        '.env.backup',
-        'credentials.json.backup',
-        'token.json.backup'
-    ]
+    out = []
+    out.append("🔍 Checking Git status for confidential files...")
     
     try:
-        # Get git status
-        result = subprocess.run(['git', 'status', '--porcelain'], 
-                              capture_output=True, text=True, check=True)
-        
-        git_files = result.stdout.strip().split('\n') if result.stdout.strip() else []
-        
-        # Check for confidential files in git status
-        found_confidential = []
-        for file_line in git_files:
-            if file_line:
-                filename = file_line[3:]  # Remove git status prefix
-                if any(conf_file in filename for conf_file in confidential_files):
-                    found_confidential.append(filename)
+        # Known locations are checked by git itself; git status catches copies elsewhere
+        found_confidential = _unignored_confidential_files() or _confidential_status_entries()
         
         if found_confidential:
-            print("❌ SECURITY RISK: Confidential files found in git status:")
+            out.append("❌ SECURITY RISK: Confidential files found in git status:")
             for file in found_confidential:
-                print(f"   - {file}")
-            print("\n💡 These files should be added to .gitignore")
-            return False
+                out.append(f"   - {file}")
+            out.append("\n💡 These files should be added to .gitignore")
+            return False, out
         else:
-            print("✅ No confidential files found in git status")
-            return True
+            out.append("✅ No confidential files found in git status")
+            return True, out
             
     except subprocess.CalledProcessError:
-        print("⚠️  Not a git repository or git not available")
-        return True
+        out.append("⚠️  Not a git repository or git not available")
+        return True, out
     except FileNotFoundError:
-        print("⚠️  Git not found in PATH")
-        return True
+        out.append("⚠️  Git not found in PATH")
+        return True, out
+
+@lru_cache(maxsize=8)
+def _read_gitignore_lines(path, mtime_ns):
+    """Parse .gitignore into a set of stripped lines, cached until the file changes"""
+    with open(path, 'r') as f:
+        return frozenset(line.strip() for line in f)
 
 def check_gitignore():
     """Check if .gitignore exists and contains confidential files"""
-    print("\n🔍 Checking .gitignore file...")
+    out = []
+    out.append("\n🔍 Checking .gitignore file...")
     
     gitignore_path = Path('.gitignore')
     if not gitignore_path.exists():
-        print("❌ .gitignore file not found!")
-        return False
+        out.append("❌ .gitignore file not found!")
+        return False, out
     
-    with open(gitignore_path, 'r') as f:
-        gitignore_content = f.read()
+    try:
+        # Ask git whether each confidential name would be ignored (whether or
+        # not it exists yet), so equivalent patterns like "/.env" or "*.json" count
+        unignored = _unignored_paths(CONFIDENTIAL_FILES, no_index=True)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        unignored = None  # No git: fall back to looking for the patterns verbatim
     
-    required_patterns = [
-        '.env',
-        'credentials.json',
-        'token.json',
-        '*.db'
-    ]
+    if unignored:
+        out.append("⚠️  Confidential files not ignored by .gitignore:")
+        for name in unignored:
+            out.append(f"   - {name}")
+        return False, out
+    
+    if unignored is not None:
+        out.append("✅ .gitignore covers all confidential files")
+        return True, out
     
-    missing_patterns = []
-    for pattern in required_patterns:
-        if pattern not in gitignore_content:
-            missing_patterns.append(pattern)
+    gitignore_lines = _read_gitignore_lines(gitignore_path, gitignore_path.stat().st_mtime_ns)
+    
+    missing_patterns = [
+        pattern for pattern in REQUIRED_GITIGNORE_PATTERNS
+        if pattern not in gitignore_lines
+    ]
     
     if missing_patterns:
-        print("⚠️  Missing patterns in .gitignore:")
+        out.append("⚠️  Missing patterns in .gitignore:")
         for pattern in missing_patterns:
-            print(f"   - {pattern}")
-        return False
+            out.append(f"   - {pattern}")
+        return False, out
     else:
-        print("✅ .gitignore contains required confidential file patterns")
-        return True
+        out.append("✅ .gitignore contains required confidential file patterns")
+        return True, out
 
 def check_file_existence():
     """Check if confidential files exist"""
-    print("\n🔍 Checking for confidential files...")
+    out = []
+    out.append("\n🔍 Checking for confidential files...")
     
     files_to_check = {
         '.env': 'Environment variables',
@@ -100,37 +189,59 @@ def check_file_existence():
         'credentials.json.example': 'Credentials template'
     }
     
+    # One directory listing per parent directory instead of a stat per file
+    entries = {}
+    for directory in {os.path.dirname(filename) or '.' for filename in files_to_check}:
+        try:
+            with os.scandir(directory) as it:
+                entries[directory] = {entry.name for entry in it}
+        except OSError:
+            entries[directory] = set()
+    
     for filename, description in files_to_check.items():
-        if Path(filename).exists():
-            print(f"✅ {filename} - {description}")
+        directory = os.path.dirname(filename) or '.'
+        if os.path.basename(filename) in entries[directory]:
+            out.append(f"✅ {filename} - {description}")
         else:
             if filename.endswith('.example'):
-                print(f"⚠️  {filename} - {description} (template missing)")
+                out.append(f"⚠️  {filename} - {description} (template missing)")
             else:
-                print(f"❌ {filename} - {description} (required file missing)")
+                out.append(f"❌ {filename} - {description} (required file missing)")
+    
+    return out
 
 def main():
     """Main security check function"""
-    print("🔐 Git Security Check for Daily Email & Task Agent")
-    print("=" * 55)
-    
     os.chdir(Path(__file__).parent)
     
-    gitignore_ok = check_gitignore()
-    git_status_ok = check_git_status()
-    check_file_existence()
+    gitignore_ok, gitignore_out = check_gitignore()
+    git_status_ok, git_status_out = check_git_status()
+    files_out = check_file_existence()
     
-    print("\n" + "=" * 55)
+    # Collect all output and emit it with a single write
+    out = [
+        "🔐 Git Security Check for Daily Email & Task Agent",
+        "=" * 55,
+        *gitignore_out,
+        *git_status_out,
+        *files_out,
+        "\n" + "=" * 55
+    ]
     if gitignore_ok and git_status_ok:
-        print("🎉 Security check PASSED! Safe to commit to Git.")
-        sys.exit(0)
+        out.append("🎉 Security check PASSED! Safe to commit to Git.")
+        exit_code = 0
     else:
-        print("⚠️  Security check FAILED! Fix issues before committing.")
-        print("\n📋 Next steps:")
-        print("1. Review and update .gitignore file")
-        print("2. Remove any confidential files from git tracking")
-        print("3. Run this script again to verify")
-        sys.exit(1)
+        out.extend([
+            "⚠️  Security check FAILED! Fix issues before committing.",
+            "\n📋 Next steps:",
+            "1. Review and update .gitignore file",
+            "2. Remove any confidential files from git tracking",
+            "3. Run this script again to verify"
+        ])
+        exit_code = 1
+    
+    sys.stdout.write("\n".join(out) + "\n")
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
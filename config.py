@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from typing import Optional
 from pydantic_settings import BaseSettings
 
@@ -19,6 +20,8 @@ class Settings(BaseSettings):
     gmail_max_emails: int = 50
     process_unread_only: bool = True
     process_starred_emails: bool = True
+    openai_concurrency: int = 8  # Emails analyzed in parallel
+    openai_rpm: int = 500  # OpenAI requests per minute (0 = unlimited)
 
     # Task Management
     default_task_list_name: str = "My Tasks"
@@ -31,6 +34,7 @@ class Settings(BaseSettings):
     log_level: str = "INFO"
     max_daily_processing: int = 100
     email_processing_schedule: str = "8:00"  # 8 AM daily
+    skip_preflight: bool = False  # Skip run.py startup checks
 
     model_config = {
         "env_file": ".env",
@@ -39,4 +43,14 @@ class Settings(BaseSettings):
     }
 
 
-settings = Settings()
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Load settings on first use and reuse them for the rest of the process"""
+    return Settings()
+
+
+def __getattr__(name: str):
+    # Keep `from config import settings` working without parsing .env at import time
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
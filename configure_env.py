@@ -4,20 +4,24 @@ Interactive script to configure your .env file with API keys
 """
 
 import os
+import sys
 from pathlib import Path
 
+MEDIUM_API_TIMEOUT = 5  # seconds
+
 def create_env_file():
     """Create .env file with user input"""
     env_file = Path(".env")
     
-    print("🔧 Daily Medium Writer Agent Configuration")
-    print("=" * 50)
-    print("This script will help you configure your API keys.")
-    print("Press Enter to skip optional keys.\n")
-    
-    # Required keys
-    print("📋 REQUIRED API KEYS:")
-    print("-" * 20)
+    # Emit each block of static output with a single write before prompting
+    sys.stdout.write("\n".join([
+        "🔧 Daily Medium Writer Agent Configuration",
+        "=" * 50,
+        "This script will help you configure your API keys.",
+        "Press Enter to skip optional keys.\n",
+        "📋 REQUIRED API KEYS:",
+        "-" * 20
+    ]) + "\n")
     
     openai_key = input("OpenAI API Key (sk-...): ").strip()
     if not openai_key:
@@ -30,8 +34,8 @@ def create_env_file():
         return False
     
     # Get Medium User ID
-    print("\n🔍 Getting your Medium User ID...")
-    print("We'll use your access token to fetch your user ID automatically.")
+    sys.stdout.write("\n🔍 Getting your Medium User ID...\n"
+                     "We'll use your access token to fetch your user ID automatically.\n")
     
     try:
         import requests
@@ -39,16 +43,19 @@ def create_env_file():
             "Authorization": f"Bearer {medium_token}",
             "Content-Type": "application/json"
         }
-        response = requests.get("https://api.medium.com/v1/me", headers=headers)
-        response.raise_for_status()
+        # Bounded wait on bad networks; the session reuses the connection for any follow-up calls
+        with requests.Session() as session:
+            session.headers.update(headers)
+            response = session.get("https://api.medium.com/v1/me", timeout=MEDIUM_API_TIMEOUT)
+            response.raise_for_status()
         
         user_data = response.json().get("data", {})
         medium_user_id = user_data.get('id')
         
         if medium_user_id:
-            print(f"✅ Found your Medium User ID: {medium_user_id}")
-            print(f"   Username: {user_data.get('username')}")
-            print(f"   Name: {user_data.get('name')}")
+            sys.stdout.write(f"✅ Found your Medium User ID: {medium_user_id}\n"
+                             f"   Username: {user_data.get('username')}\n"
+                             f"   Name: {user_data.get('name')}\n")
         else:
             print("❌ Could not get user ID from Medium API")
             medium_user_id = input("Please enter your Medium User ID manually: ").strip()
@@ -62,8 +69,7 @@ def create_env_file():
         return False
     
     # Optional keys
-    print("\n📋 OPTIONAL API KEYS (press Enter to skip):")
-    print("-" * 40)
+    sys.stdout.write("\n📋 OPTIONAL API KEYS (press Enter to skip):\n" + "-" * 40 + "\n")
     
     news_api_key = input("NewsAPI Key (for topic discovery): ").strip()
     reddit_client_id = input("Reddit Client ID: ").strip()
@@ -106,15 +112,16 @@ HUMAN_REVIEW_REQUIRED=true
         with open(env_file, 'w') as f:
             f.write(env_content)
         
-        print(f"\n✅ Configuration saved to {env_file}")
-        print("\n🎉 Setup complete! Your API keys are configured.")
-        
         # Show next steps
-        print("\n📋 NEXT STEPS:")
-        print("1. Install dependencies: source venv/bin/activate && pip install -r requirements.txt")
-        print("2. Test setup: python test_setup.py")
-        print("3. Start application: python run.py")
-        print("4. Open browser: http://localhost:8000")
+        sys.stdout.write("\n".join([
+            f"\n✅ Configuration saved to {env_file}",
+            "\n🎉 Setup complete! Your API keys are configured.",
+            "\n📋 NEXT STEPS:",
+            "1. Install dependencies: source venv/bin/activate && pip install -r requirements.txt",
+            "2. Test setup: python test_setup.py",
+            "3. Start application: python run.py",
+            "4. Open browser: http://localhost:8000"
+        ]) + "\n")
         
         return True
         
@@ -136,6 +143,5 @@ def main():
     return 0
 
 if __name__ == "__main__":
-    import sys
     sys.exit(main())
 
@@ -4,58 +4,66 @@ Interactive script to help configure Google API credentials
 """
 
 import os
+import sys
 import json
+from functools import lru_cache
 from pathlib import Path
 
+
+@lru_cache(maxsize=8)
+def _load_credentials(path, mtime_ns):
+    """Parse a credentials JSON file, cached until the file changes"""
+    with open(path) as f:
+        return json.load(f)
+
 def create_google_credentials_guide():
     """Create a guide for setting up Google API credentials"""
-    print("🔧 Google API Setup Guide")
-    print("=" * 50)
-    print()
-    
-    print("📋 Step 1: Create Google Cloud Project")
-    print("-" * 35)
-    print("1. Go to https://console.cloud.google.com")
-    print("2. Create a new project or select existing")
-    print("3. Name it 'Email Task Agent' or similar")
-    print()
-    
-    print("📋 Step 2: Enable Required APIs")
-    print("-" * 30)
-    print("1. In Google Cloud Console, go to 'APIs & Services' > 'Library'")
-    print("2. Search and enable these APIs:")
-    print("   • Gmail API")
-    print("   • Google Tasks API")
-    print("3. Click 'Enable' for each")
-    print()
-    
-    print("📋 Step 3: Create OAuth Credentials")
-    print("-" * 35)
-    print("1. Go to 'APIs & Services' > 'Credentials'")
-    print("2. Click '+ CREATE CREDENTIALS' > 'OAuth client ID'")
-    print("3. If asked, configure OAuth consent screen:")
-    print("   • User Type: External")
-    print("   • App name: Email Task Agent")
-    print("   • User support email: your email")
-    print("   • Developer contact: your email")
-    print("   • Add scopes: ../auth/gmail.readonly, ../auth/tasks")
-    print("   • Add test users: your email")
-    print("4. For OAuth client ID:")
-    print("   • Application type: Desktop application")
-    print("   • Name: Email Task Agent")
-    print("5. Download the JSON file")
-    print("6. Save it as 'credentials.json' in this directory")
-    print()
-    
-    print("📋 Step 4: Test Connection")
-    print("-" * 25)
-    print("1. Run: python test_google_apis.py")
-    print("2. Follow OAuth flow in browser")
-    print("3. Grant permissions for Gmail and Tasks")
-    print()
-    
-    print("✅ That's it! Your Google APIs will be ready to use.")
-    print()
+    # Emit the whole guide with a single write
+    guide = [
+        "🔧 Google API Setup Guide",
+        "=" * 50,
+        "",
+        "📋 Step 1: Create Google Cloud Project",
+        "-" * 35,
+        "1. Go to https://console.cloud.google.com",
+        "2. Create a new project or select existing",
+        "3. Name it 'Email Task Agent' or similar",
+        "",
+        "📋 Step 2: Enable Required APIs",
+        "-" * 30,
+        "1. In Google Cloud Console, go to 'APIs & Services' > 'Library'",
+        "2. Search and enable these APIs:",
+        "   • Gmail API",
+        "   • Google Tasks API",
+        "3. Click 'Enable' for each",
+        "",
+        "📋 Step 3: Create OAuth Credentials",
+        "-" * 35,
+        "1. Go to 'APIs & Services' > 'Credentials'",
+        "2. Click '+ CREATE CREDENTIALS' > 'OAuth client ID'",
+        "3. If asked, configure OAuth consent screen:",
+        "   • User Type: External",
+        "   • App name: Email Task Agent",
+        "   • User support email: your email",
+        "   • Developer contact: your email",
+        "   • Add scopes: ../auth/gmail.readonly, ../auth/tasks",
+        "   • Add test users: your email",
+        "4. For OAuth client ID:",
+        "   • Application type: Desktop application",
+        "   • Name: Email Task Agent",
+        "5. Download the JSON file",
+        "6. Save it as 'credentials.json' in this directory",
+        "",
+        "📋 Step 4: Test Connection",
+        "-" * 25,
+        "1. Run: python test_google_apis.py",
+        "2. Follow OAuth flow in browser",
+        "3. Grant permissions for Gmail and Tasks",
+        "",
+        "✅ That's it! Your Google APIs will be ready to use.",
+        ""
+    ]
+    sys.stdout.write("\n".join(guide) + "\n")
     
     # Check if credentials file exists
     creds_file = Path("credentials.json")
@@ -64,8 +72,7 @@ def create_google_credentials_guide():
         
         # Validate it's a valid JSON
         try:
-            with open(creds_file) as f:
-                creds = json.load(f)
+            creds = _load_credentials(creds_file, creds_file.stat().st_mtime_ns)
             
             if "installed" in creds or "web" in creds:
                 print("✅ Credentials file appears valid")
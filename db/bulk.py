@@ -0,0 +1,64 @@
+from typing import List, Dict, Any
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from db.models import Email, EmailBody
+
+# Dialects whose INSERT supports ON CONFLICT DO NOTHING
+_UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def bulk_insert_emails(db: Session, rows: List[Dict[str, Any]],
+                       ignore_duplicates: bool = False) -> List[int]:
+    """
+    Insert many emails with a single executemany, bypassing the unit of work
+    
+    Each row may carry a 'body' key; bodies are written to the email_bodies
+    side table with a second executemany. The caller owns the transaction and
+    must commit.
+    
+    With ignore_duplicates, rows whose gmail_id already exists are skipped
+    via ON CONFLICT DO NOTHING (PostgreSQL and SQLite), so concurrent fetches
+    of the same messages cannot fail the batch.
+    
+    Returns:
+        IDs of the inserted emails, in the same order as rows
+    """
+    if not rows:
+        return []
+    
+    bodies = {row['gmail_id']: row.get('body') for row in rows}
+    email_rows = [{k: v for k, v in row.items() if k != 'body'} for row in rows]
+    
+    upsert_insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if ignore_duplicates and upsert_insert is not None:
+        # Skipped rows return nothing, so match results back by gmail_id
+        result = db.execute(
+            upsert_insert(Email).on_conflict_do_nothing(
+                index_elements=[Email.gmail_id]
+            ).returning(Email.id, Email.gmail_id),
+            email_rows
+        )
+        inserted = {gmail_id: email_id for email_id, gmail_id in result}
+        gmail_ids = [row['gmail_id'] for row in email_rows if row['gmail_id'] in inserted]
+        email_ids = [inserted[gmail_id] for gmail_id in gmail_ids]
+    else:
+        result = db.execute(
+            insert(Email).returning(Email.id, sort_by_parameter_order=True),
+            email_rows
+        )
+        gmail_ids = [row['gmail_id'] for row in email_rows]
+        email_ids = list(result.scalars())
+    
+    body_rows = [
+        {'email_id': email_id, 'body': bodies[gmail_id]}
+        for email_id, gmail_id in zip(email_ids, gmail_ids)
+        if bodies[gmail_id] is not None
+    ]
+    if body_rows:
+        db.execute(insert(EmailBody), body_rows)
+    
+    return email_ids
@@ -1,9 +1,64 @@
-from sqlalchemy import create_engine
+import hashlib
+import os
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Connection, make_url
+from sqlalchemy.types import Integer
+from sqlalchemy.schema import CreateTable, CreateIndex
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.ext.declarative import declarative_base
 from config import settings
 
-engine = create_engine(settings.database_url)
+# Bulk inserts (db/bulk.py, processing logs) are sent as multi-row
+# INSERT ... VALUES statements of up to this many rows each
+INSERT_PAGE_SIZE = 1000
+
+# Connection pool for non-SQLite databases
+POOL_SIZE = 10
+POOL_MAX_OVERFLOW = 5
+POOL_RECYCLE_SECONDS = 1800
+
+
+def _engine_options(database_url: str) -> dict:
+    """Driver-specific create_engine options"""
+    options = {"insertmanyvalues_page_size": INSERT_PAGE_SIZE}
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite":
+        # Server databases: keep warm connections for the web handlers, the
+        # scheduler and the threadpool, and drop ones the server timed out
+        options.update(
+            pool_size=POOL_SIZE,
+            max_overflow=POOL_MAX_OVERFLOW,
+            pool_pre_ping=True,
+            pool_recycle=POOL_RECYCLE_SECONDS
+        )
+    if url.get_backend_name() == "postgresql" and url.get_driver_name() == "psycopg2":
+        # INSERTs already use multi-row VALUES; also batch executemany
+        # UPDATE/DELETE statements with psycopg2's execute_batch
+        options["executemany_mode"] = "values_plus_batch"
+        options["executemany_batch_page_size"] = 500
+    return options
+
+
+engine = create_engine(settings.database_url, **_engine_options(settings.database_url))
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """Use WAL and keep more pages in memory for the read-heavy dashboard"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA cache_size=-20000")  # ~20 MB page cache
+        cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB memory map
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA foreign_keys=ON")  # Honour ON DELETE for email bodies/tasks
+        cursor.close()
+
+# Connectivity check shared by the health check and the startup scripts
+PING_QUERY = text("SELECT 1")
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -18,8 +73,153 @@ def get_db() -> Session:
         db.close()
 
 
-def create_tables():
-    """Create all tables"""
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """Session for one unit of work: committed on success, rolled back on error"""
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+SCHEMA_MARKER_FILE = "data/.schema_marker"
+# Data migrations run by create_tables(); part of the fingerprint so adding
+# one makes ensure_tables() run create_tables() again on existing installs
+SCHEMA_MIGRATIONS = ("status_codes", "email_bodies", "utc_timestamp_defaults")
+
+
+def _schema_fingerprint() -> str:
+    """Hash of the database URL and the DDL for every model table and index"""
+    from db.models import Base
+    digest = hashlib.sha256(settings.database_url.encode())
+    digest.update(",".join(SCHEMA_MIGRATIONS).encode())
+    for table in Base.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=engine.dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            digest.update(str(CreateIndex(index).compile(dialect=engine.dialect)).encode())
+    return digest.hexdigest()
+
+
+def create_tables(connection: Optional[Connection] = None):
+    """
+    Create all tables, on connection's transaction when given
+    
+    A caller passing its own connection must call write_schema_marker()
+    once that transaction has committed.
+    """
     from db.models import Base
-    Base.metadata.create_all(bind=engine)
+    if connection is None:
+        # One connection and transaction for every existence check and DDL statement
+        with engine.begin() as connection:
+            create_tables(connection)
+        write_schema_marker()
+        return
+    
+    Base.metadata.create_all(bind=connection)
+    # create_all skips tables that already exist; add indexes introduced since
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+    migrate_status_columns(connection)
+    backfill_email_bodies(connection)
+    migrate_timestamp_defaults(connection)
+
+
+def write_schema_marker():
+    """Record the current schema so ensure_tables() skips create_tables() next time"""
+    os.makedirs(os.path.dirname(SCHEMA_MARKER_FILE), exist_ok=True)
+    with open(SCHEMA_MARKER_FILE, 'w') as f:
+        f.write(_schema_fingerprint())
+
+
+def migrate_status_columns(connection: Connection):
+    """Rewrite status columns created as text (enum values) to their integer codes"""
+    from db.models import Email, Task
+    inspector = inspect(connection)
+    table_names = set(inspector.get_table_names())
+    
+    for model in (Email, Task):
+        table_name = model.__tablename__
+        if table_name not in table_names:
+            continue
+        column = next(column for column in inspector.get_columns(table_name)
+                      if column['name'] == 'status')
+        if isinstance(column['type'], Integer):
+            continue  # Created with the integer codes
+        
+        status_type = model.__table__.c.status.type
+        cases = " ".join(
+            f"WHEN '{member.value}' THEN {code}"
+            for code, member in enumerate(status_type.enum_class)
+        )
+        if connection.dialect.name == "postgresql":
+            connection.execute(text(
+                f"ALTER TABLE {table_name} ALTER COLUMN status DROP DEFAULT, "
+                f"ALTER COLUMN status TYPE SMALLINT "
+                f"USING (CASE status {cases} ELSE CAST(status AS SMALLINT) END)"
+            ))
+        else:
+            # SQLite cannot change a column's type; the codes are stored as
+            # digit strings, which StatusType reads back as codes
+            connection.execute(text(
+                f"UPDATE {table_name} SET status = CASE status {cases} ELSE status END"
+            ))
+
+
+def backfill_email_bodies(connection: Connection):
+    """Copy bodies from the old emails.body column into email_bodies"""
+    columns = {column['name'] for column in inspect(connection).get_columns("emails")}
+    if "body" not in columns:
+        return  # Created after bodies moved to their own table
+    
+    # Rows already copied are skipped, so this is safe to run again
+    connection.execute(text(
+        "INSERT INTO email_bodies (email_id, body) "
+        "SELECT id, body FROM emails "
+        "WHERE body IS NOT NULL "
+        "AND NOT EXISTS (SELECT 1 FROM email_bodies WHERE email_bodies.email_id = emails.id)"
+    ))
+
+
+def migrate_timestamp_defaults(connection: Connection):
+    """Point existing PostgreSQL timestamp columns at the UTC server default"""
+    if connection.dialect.name != "postgresql":
+        return  # SQLite's CURRENT_TIMESTAMP default was already UTC
+    
+    from db.models import Base, utcnow
+    # Tables created earlier default to local-time now(), or have no default;
+    # SET DEFAULT is idempotent, so this is safe to run again
+    for table in Base.metadata.sorted_tables:
+        for column in table.columns:
+            default = column.server_default.arg if column.server_default is not None else None
+            if not isinstance(default, utcnow):
+                continue
+            connection.execute(text(
+                f"ALTER TABLE {table.name} ALTER COLUMN {column.name} "
+                f"SET DEFAULT {default.compile(dialect=connection.dialect)}"
+            ))
+
+
+def ensure_tables():
+    """Create tables only if the schema changed since the last create_tables() run"""
+    # A missing or in-memory SQLite database always needs its tables
+    if engine.dialect.name == "sqlite":
+        database_file = engine.url.database
+        if not database_file or database_file == ":memory:" or not os.path.exists(database_file):
+            create_tables()
+            return
+    
+    try:
+        with open(SCHEMA_MARKER_FILE) as f:
+            if f.read() == _schema_fingerprint():
+                return
+    except FileNotFoundError:
+        pass
+    
+    create_tables()
 
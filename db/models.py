@@ -1,7 +1,13 @@
-from datetime import datetime
 from enum import Enum
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Float, JSON
+from sqlalchemy import (
+    Column, Integer, SmallInteger, String, Text, DateTime, Boolean, Float, JSON,
+    Index, ForeignKey, CheckConstraint
+)
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import relationship
 
 Base = declarative_base()
@@ -20,8 +26,73 @@ class TaskStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
+class StatusType(TypeDecorator):
+    """Store a status enum as a small integer code (its declaration order)
+
+    New members must be appended to the enum so existing codes stay stable.
+    """
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum_class, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.enum_class = enum_class
+        self._members = list(enum_class)
+        self._codes = {member: code for code, member in enumerate(self._members)}
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return self._codes[self.enum_class(value)]
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            # Text columns from before the integer codes: SQLite keeps codes
+            # written there as digit strings, and rows not yet converted by
+            # migrate_status_columns() still hold the enum value
+            if not value.isdigit():
+                return self.enum_class(value)
+            value = int(value)
+        return self._members[value]
+
+    def check_constraint(self, column_name: str, name: str) -> CheckConstraint:
+        """CHECK constraint limiting the column to valid codes"""
+        return CheckConstraint(f"{column_name} BETWEEN 0 AND {len(self._members) - 1}", name=name)
+
+
+class utcnow(FunctionElement):
+    """Current UTC time for naive DateTime columns, like datetime.utcnow()"""
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _compile_utcnow(element, compiler, **kw):
+    # SQLite's CURRENT_TIMESTAMP is UTC
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(utcnow, "postgresql")
+def _compile_utcnow_postgresql(element, compiler, **kw):
+    # now() is a timestamptz; stored into "timestamp without time zone" it
+    # would become the session's local time
+    return "timezone('utc', now())"
+
+
+EMAIL_STATUS_TYPE = StatusType(EmailStatus)
+TASK_STATUS_TYPE = StatusType(TaskStatus)
+
+
 class Email(Base):
     __tablename__ = "emails"
+    __table_args__ = (
+        Index("ix_emails_status_received_at", "status", "received_at"),
+        Index("ix_emails_status_created_at", "status", "created_at"),
+        Index("ix_emails_created_at", "created_at"),  # Retention cleanup
+        EMAIL_STATUS_TYPE.check_constraint("status", "ck_emails_status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -32,11 +103,10 @@ class Email(Base):
     # Email content
     sender = Column(String, nullable=False)
     subject = Column(String, nullable=False)
-    body = Column(Text)
     received_at = Column(DateTime, nullable=False)
 
     # Processing metadata
-    status = Column(String, default=EmailStatus.UNPROCESSED)
+    status = Column(EMAIL_STATUS_TYPE, default=EmailStatus.UNPROCESSED)
     processed_at = Column(DateTime, nullable=True)
 
     # AI analysis
@@ -50,15 +120,39 @@ class Email(Base):
     processing_cost = Column(Float, default=0.0)
 
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow(), nullable=False)
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
+
+    # Tasks extracted from this email
+    tasks = relationship("Task", back_populates="email")
+
+    # Body lives in a side table so list queries and scans stay narrow
+    body_record = relationship(
+        "EmailBody", uselist=False, back_populates="email", cascade="all, delete-orphan"
+    )
+    body = association_proxy("body_record", "body", creator=lambda body: EmailBody(body=body))
+
+
+class EmailBody(Base):
+    __tablename__ = "email_bodies"
+
+    email_id = Column(Integer, ForeignKey("emails.id", ondelete="CASCADE"), primary_key=True)
+    body = Column(Text)
+
+    email = relationship("Email", back_populates="body_record")
 
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_status_created_at", "status", "created_at"),
+        Index("ix_tasks_priority_status", "priority", "status"),
+        Index("ix_tasks_due_date", "due_date"),
+        TASK_STATUS_TYPE.check_constraint("status", "ck_tasks_status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    email_id = Column(Integer, nullable=True)  # Source email if extracted from email
+    email_id = Column(Integer, ForeignKey("emails.id", ondelete="SET NULL"), nullable=True)  # Source email if extracted from email
 
     # Task content
     title = Column(String, nullable=False)
@@ -69,7 +163,7 @@ class Task(Base):
     priority = Column(String, default="medium")  # low, medium, high, urgent
 
     # Status
-    status = Column(String, default=TaskStatus.PENDING)
+    status = Column(TASK_STATUS_TYPE, default=TaskStatus.PENDING)
     completed_at = Column(DateTime, nullable=True)
 
     # Google Tasks integration
@@ -81,12 +175,18 @@ class Task(Base):
     extraction_method = Column(String)  # ai, manual, imported
 
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow(), nullable=False)
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
+
+    # Source email
+    email = relationship("Email", back_populates="tasks")
 
 
 class DailySummary(Base):
     __tablename__ = "daily_summaries"
+    __table_args__ = (
+        Index("ix_daily_summaries_date", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -112,11 +212,14 @@ class DailySummary(Base):
     total_cost = Column(Float, default=0.0)
 
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow(), nullable=False)
 
 
 class ProcessingLog(Base):
     __tablename__ = "processing_logs"
+    __table_args__ = (
+        Index("ix_processing_logs_created_at", "created_at"),  # Retention cleanup
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -134,4 +237,4 @@ class ProcessingLog(Base):
     cost = Column(Float, default=0.0)
 
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, server_default=utcnow(), nullable=False)
\ No newline at end of file
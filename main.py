@@ -2,15 +2,16 @@ from fastapi import FastAPI, Request, HTTPException, Depends, Form
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, JSONResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import desc, func, case
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 import logging
 import asyncio
+import time
 
 from config import settings
-from db.database import SessionLocal, engine, Base
+from db.database import SessionLocal, ensure_tables
 from db.models import Email, Task, DailySummary, ProcessingLog, EmailStatus, TaskStatus
 from services.scheduler import EmailProcessingScheduler
 from services.gmail import GmailService
@@ -18,8 +19,8 @@ from services.tasks import GoogleTasksService
 from services.email_processor import EmailProcessor
 from services.safety import MonitoringService
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Create tables (skipped when the schema marker matches the current models)
+ensure_tables()
 
 # Initialize FastAPI
 app = FastAPI(
@@ -30,7 +31,12 @@ app = FastAPI(
 
 # Static files and templates
 app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+# Outside debug, compile each template once and never re-stat it
+templates = Jinja2Templates(
+    directory="templates",
+    auto_reload=settings.debug,
+    cache_size=400 if settings.debug else -1
+)
 
 # Initialize services
 scheduler = EmailProcessingScheduler()
@@ -56,9 +62,45 @@ def get_db():
         db.close()
 
 
+# Short-lived cache for aggregate stats: key -> (version, expires_at, payload)
+STATS_CACHE_TTL_SECONDS = 10
+API_STATS_CACHE_TTL_SECONDS = 30  # Full-table counts and sums; writes still invalidate
+_stats_cache: Dict[str, tuple] = {}
+_stats_cache_version = 0
+
+
+def get_cached_stats(key: str, compute, ttl: float = STATS_CACHE_TTL_SECONDS) -> Dict[str, Any]:
+    """Return the cached payload for key, recomputing it when stale or invalidated"""
+    # Read the version before computing, so a write that lands mid-compute
+    # leaves this payload stale instead of caching it under the new version
+    version = _stats_cache_version
+    entry = _stats_cache.get(key)
+    now = time.monotonic()
+    if entry and entry[0] == version and entry[1] > now:
+        return entry[2]
+    
+    payload = compute()
+    _stats_cache[key] = (version, now + ttl, payload)
+    return payload
+
+
+def invalidate_stats_cache():
+    """Invalidate cached stats after a write"""
+    global _stats_cache_version
+    _stats_cache_version += 1
+
+
+# Scheduled and manually triggered runs commit emails, tasks and summaries
+scheduler.on_data_changed = invalidate_stats_cache
+
+
 @app.on_event("startup")
 async def startup_event():
     """Start the scheduler on application startup"""
+    if not settings.debug:
+        for name in ("dashboard.html", "emails.html", "tasks.html", "summaries.html"):
+            templates.get_template(name)
+    
     scheduler.start()
     logger.info("Application started successfully")
 
@@ -71,8 +113,10 @@ async def shutdown_event():
 
 
 # Web Routes
+# Handlers that query the database are plain `def` so FastAPI runs them in its
+# threadpool instead of blocking the event loop with synchronous SQLAlchemy calls.
 @app.get("/", response_class=HTMLResponse)
-async def dashboard(request: Request, db: Session = Depends(get_db)):
+def dashboard(request: Request, db: Session = Depends(get_db)):
     """Main dashboard showing email and task overview"""
     
     # Get today's stats
@@ -80,16 +124,32 @@ async def dashboard(request: Request, db: Session = Depends(get_db)):
     today_start = datetime.combine(today, datetime.min.time())
     today_end = today_start + timedelta(days=1)
     
-    # Today's emails and tasks
-    today_emails = db.query(Email).filter(
-        Email.created_at >= today_start,
-        Email.created_at < today_end
-    ).count()
+    # Email and task counts (one aggregate query per table, briefly cached)
+    def compute_counts():
+        total_emails, processed_emails, today_emails = db.query(
+            func.count(Email.id),
+            func.count(case((Email.status == EmailStatus.PROCESSED, 1))),
+            func.count(case((
+                (Email.created_at >= today_start) & (Email.created_at < today_end), 1
+            )))
+        ).one()
+        
+        total_tasks, today_tasks = db.query(
+            func.count(Task.id),
+            func.count(case((
+                (Task.created_at >= today_start) & (Task.created_at < today_end), 1
+            )))
+        ).one()
+        
+        return {
+            "total_emails": total_emails,
+            "processed_emails": processed_emails,
+            "today_emails": today_emails,
+            "total_tasks": total_tasks,
+            "today_tasks": today_tasks
+        }
     
-    today_tasks = db.query(Task).filter(
-        Task.created_at >= today_start,
-        Task.created_at < today_end
-    ).count()
+    counts = get_cached_stats("dashboard", compute_counts)
     
     # Pending tasks
     pending_tasks = db.query(Task).filter(
@@ -97,9 +157,14 @@ async def dashboard(request: Request, db: Session = Depends(get_db)):
     ).order_by(desc(Task.created_at)).limit(5).all()
     
     # Recent emails
-    recent_emails = db.query(Email).order_by(
-        desc(Email.received_at)
-    ).limit(10).all()
+    recent_emails = db.query(Email).with_entities(
+        Email.id,
+        Email.sender,
+        Email.subject,
+        Email.received_at,
+        Email.importance_score,
+        Email.summary
+    ).order_by(desc(Email.received_at)).limit(10).all()
     
     # Today's summary
     today_summary = db.query(DailySummary).filter(
@@ -107,41 +172,38 @@ async def dashboard(request: Request, db: Session = Depends(get_db)):
         DailySummary.date < today_end
     ).first()
     
-    # Stats
-    total_emails = db.query(Email).count()
-    processed_emails = db.query(Email).filter(
-        Email.status == EmailStatus.PROCESSED
-    ).count()
-    total_tasks = db.query(Task).count()
-    
     return templates.TemplateResponse("dashboard.html", {
         "request": request,
-        "today_emails": today_emails,
-        "today_tasks": today_tasks,
+        **counts,
         "pending_tasks": pending_tasks,
         "recent_emails": recent_emails,
-        "today_summary": today_summary,
-        "total_emails": total_emails,
-        "processed_emails": processed_emails,
-        "total_tasks": total_tasks
+        "today_summary": today_summary
     })
 
 
 @app.get("/emails", response_class=HTMLResponse)
-async def emails_page(request: Request, db: Session = Depends(get_db)):
+def emails_page(request: Request, db: Session = Depends(get_db)):
     """Email processing page"""
     
     # Get emails with pagination
-    emails = db.query(Email).order_by(desc(Email.received_at)).limit(50).all()
+    # Only the columns the list renders; skips the potentially large body
+    emails = db.query(Email).with_entities(
+        Email.id,
+        Email.sender,
+        Email.subject,
+        Email.received_at,
+        Email.status,
+        Email.importance_score,
+        Email.has_action_items,
+        Email.summary
+    ).order_by(desc(Email.received_at)).limit(50).all()
     
     # Stats
-    total_emails = db.query(Email).count()
-    processed_emails = db.query(Email).filter(
-        Email.status == EmailStatus.PROCESSED
-    ).count()
-    unprocessed_emails = db.query(Email).filter(
-        Email.status == EmailStatus.UNPROCESSED
-    ).count()
+    total_emails, processed_emails, unprocessed_emails = db.query(
+        func.count(Email.id),
+        func.count(case((Email.status == EmailStatus.PROCESSED, 1))),
+        func.count(case((Email.status == EmailStatus.UNPROCESSED, 1)))
+    ).one()
     
     return templates.TemplateResponse("emails.html", {
         "request": request,
@@ -153,7 +215,7 @@ async def emails_page(request: Request, db: Session = Depends(get_db)):
 
 
 @app.get("/tasks", response_class=HTMLResponse)
-async def tasks_page(request: Request, db: Session = Depends(get_db)):
+def tasks_page(request: Request, db: Session = Depends(get_db)):
     """Task management page"""
     
     # Get tasks
@@ -166,11 +228,12 @@ async def tasks_page(request: Request, db: Session = Depends(get_db)):
     ).order_by(desc(Task.completed_at)).limit(10).all()
     
     # Stats
-    total_tasks = db.query(Task).count()
-    high_priority_tasks = db.query(Task).filter(
-        Task.priority.in_(["high", "urgent"]),
-        Task.status == TaskStatus.PENDING
-    ).count()
+    total_tasks, high_priority_tasks = db.query(
+        func.count(Task.id),
+        func.count(case((
+            Task.priority.in_(["high", "urgent"]) & (Task.status == TaskStatus.PENDING), 1
+        )))
+    ).one()
     
     return templates.TemplateResponse("tasks.html", {
         "request": request,
@@ -182,7 +245,7 @@ async def tasks_page(request: Request, db: Session = Depends(get_db)):
 
 
 @app.get("/summaries", response_class=HTMLResponse)
-async def summaries_page(request: Request, db: Session = Depends(get_db)):
+def summaries_page(request: Request, db: Session = Depends(get_db)):
     """Daily summaries page"""
     
     # Get recent summaries
@@ -201,6 +264,7 @@ async def summaries_page(request: Request, db: Session = Depends(get_db)):
 async def trigger_email_processing():
     """Manually trigger email processing"""
     try:
+        # The scheduler invalidates cached stats as the run commits its results
         job_id = scheduler.trigger_manual_processing()
         return {"message": "Email processing started", "job_id": job_id}
     except Exception as e:
@@ -220,7 +284,7 @@ async def sync_tasks():
 
 
 @app.post("/api/tasks")
-async def create_task(
+def create_task(
     title: str = Form(...),
     description: str = Form(""),
     due_date: Optional[str] = Form(None),
@@ -245,6 +309,7 @@ async def create_task(
         db.add(task)
         db.commit()
         db.refresh(task)
+        invalidate_stats_cache()
         
         return {"message": "Task created successfully", "task_id": task.id}
         
@@ -254,7 +319,7 @@ async def create_task(
 
 
 @app.post("/api/tasks/{task_id}/complete")
-async def complete_task(task_id: int, db: Session = Depends(get_db)):
+def complete_task(task_id: int, db: Session = Depends(get_db)):
     """Mark task as completed"""
     try:
         task = db.query(Task).filter(Task.id == task_id).first()
@@ -264,6 +329,7 @@ async def complete_task(task_id: int, db: Session = Depends(get_db)):
         task.status = TaskStatus.COMPLETED
         task.completed_at = datetime.utcnow()
         db.commit()
+        invalidate_stats_cache()
         
         return {"message": "Task completed successfully"}
         
@@ -273,9 +339,11 @@ async def complete_task(task_id: int, db: Session = Depends(get_db)):
 
 
 @app.get("/api/emails/{email_id}")
-async def get_email(email_id: int, db: Session = Depends(get_db)):
+def get_email(email_id: int, db: Session = Depends(get_db)):
     """Get email details"""
-    email = db.query(Email).filter(Email.id == email_id).first()
+    email = db.query(Email).options(
+        joinedload(Email.body_record)
+    ).filter(Email.id == email_id).first()
     if not email:
         raise HTTPException(status_code=404, detail="Email not found")
     
@@ -293,31 +361,32 @@ async def get_email(email_id: int, db: Session = Depends(get_db)):
 
 
 @app.get("/api/stats")
-async def get_stats(db: Session = Depends(get_db)):
+def get_stats(db: Session = Depends(get_db)):
     """Get application statistics"""
+    return get_cached_stats("api_stats", lambda: _compute_stats(db), ttl=API_STATS_CACHE_TTL_SECONDS)
+
+
+def _compute_stats(db: Session) -> Dict[str, Any]:
+    """Compute application statistics"""
+    week_ago = datetime.now() - timedelta(days=7)
     
-    # Basic counts
-    total_emails = db.query(Email).count()
-    processed_emails = db.query(Email).filter(
-        Email.status == EmailStatus.PROCESSED
-    ).count()
-    total_tasks = db.query(Task).count()
-    pending_tasks = db.query(Task).filter(
-        Task.status == TaskStatus.PENDING
-    ).count()
-    
-    # Cost and performance
-    total_cost = db.query(func.sum(Email.processing_cost)).scalar() or 0.0
-    total_tokens = db.query(func.sum(Email.tokens_used)).scalar() or 0
+    # Counts, cost and recent activity (last 7 days) in one query per table
+    (total_emails, processed_emails, recent_emails,
+     total_cost, total_tokens) = db.query(
+        func.count(Email.id),
+        func.count(case((Email.status == EmailStatus.PROCESSED, 1))),
+        func.count(case((Email.created_at >= week_ago, 1))),
+        func.sum(Email.processing_cost),
+        func.sum(Email.tokens_used)
+    ).one()
+    total_cost = total_cost or 0.0
+    total_tokens = total_tokens or 0
     
-    # Recent activity (last 7 days)
-    week_ago = datetime.now() - timedelta(days=7)
-    recent_emails = db.query(Email).filter(
-        Email.created_at >= week_ago
-    ).count()
-    recent_tasks = db.query(Task).filter(
-        Task.created_at >= week_ago
-    ).count()
+    total_tasks, pending_tasks, recent_tasks = db.query(
+        func.count(Task.id),
+        func.count(case((Task.status == TaskStatus.PENDING, 1))),
+        func.count(case((Task.created_at >= week_ago, 1)))
+    ).one()
     
     return {
         "total_emails": total_emails,
@@ -332,7 +401,7 @@ async def get_stats(db: Session = Depends(get_db)):
 
 
 @app.get("/api/health")
-async def health_check():
+def health_check():
     """Application health check"""
     health = monitoring_service.check_system_health()
     return health
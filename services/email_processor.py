@@ -1,10 +1,12 @@
+import asyncio
 import json
 import time
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Tuple
-from openai import OpenAI
-from langchain.schema import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
+from openai import OpenAI, AsyncOpenAI
+from sqlalchemy import func, case, insert
+from sqlalchemy.orm import Session, selectinload
 from config import settings
 from db.models import Email, EmailStatus, Task, TaskStatus, ProcessingLog
 from db.database import SessionLocal
@@ -12,129 +14,315 @@ from services.tasks import GoogleTasksService
 import logging
 import re
 
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the stdlib parser
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# Emails processed between commits of the shared batch session
+COMMIT_BATCH_SIZE = 25
+# Emails loaded into memory at a time by process_unprocessed_emails
+FETCH_BATCH_SIZE = 100
+# Queued ProcessingLog rows inserted per executemany
+LOG_FLUSH_SIZE = 50
+
+
+
+class EmailContent(NamedTuple):
+    """Fields the AI steps read, copied while the email is loaded in a worker thread"""
+    id: int
+    sender: Optional[str]
+    subject: Optional[str]
+    body: Optional[str]
+
+
+def _email_content(email: Email) -> EmailContent:
+    return EmailContent(email.id, email.sender, email.subject, email.body)
+
+# Non-ISO formats accepted for task due dates
+_FALLBACK_DATE_PATTERNS = ("%m/%d/%Y", "%d/%m/%Y")
+
+# Relative due dates: one regex pass, then earlier keywords win
+_RELATIVE_DATE_PATTERN = re.compile(r'today|tomorrow|monday|friday|next week')
+_RELATIVE_DATE_PRIORITY = ('today', 'tomorrow', 'monday', 'friday', 'next week')
+_RELATIVE_DAY_OFFSETS = {'today': 0, 'tomorrow': 1, 'next week': 7}
+_RELATIVE_WEEKDAYS = {'monday': 0, 'friday': 4}
+
+# Emails that can be analyzed without asking for tasks
+_AUTOMATED_SENDER_PATTERN = re.compile(r'no-?reply|newsletter|notifications?@', re.IGNORECASE)
+_ACTION_KEYWORD_PATTERN = re.compile(
+    r'\b(please|by\s+\w+day|deadline|due|action required|asap|urgent|respond|reply|review|approve|schedule|meeting|confirm)\b',
+    re.IGNORECASE
+)
+
+_TASKS_PROMPT_SECTION = """"tasks": an array of actionable tasks. For each task include:
+        - title: string (concise task description)
+        - description: string (more details if needed)
+        - due_date: string (ISO format date if mentioned, null if not)
+        - priority: string ("low", "medium", "high", "urgent")
+        - confidence: float (0.0 to 1.0 - how confident you are this is a real task)
+        
+        Only extract tasks that are:
+        - Clearly actionable (not just FYI)
+        - Directed at the email recipient
+        - Specific enough to be acted upon
+        
+        If no clear tasks, use an empty array.
+        
+        JSON format:
+        {"importance": {...}, "summary": "...", "tasks": [...]}"""
+
+_NO_TASKS_PROMPT_SECTION = """JSON format:
+        {"importance": {...}, "summary": "..."}"""
+
+# End the daily summary once the model moves past the requested paragraph
+_SUMMARY_STOP_SEQUENCES = ["\n---", "\n\n\n", "\n\nSummary:"]
+
+# Line separator for prompt sections built from lists
+_NL = "\n"
+
+# Characters of (cleaned) body sent to OpenAI per email
+PROMPT_BODY_CHARS = 2000
+# Markup and whitespace stripped from bodies before they are sent to OpenAI
+_HTML_BLOCK_PATTERN = re.compile(r'<(script|style|head)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def _prompt_body(body: Optional[str]) -> str:
+    """Strip HTML and collapse whitespace, then slice the body once for the prompt"""
+    if not body:
+        return ''
+    if '<' in body:
+        body = _HTML_TAG_PATTERN.sub(' ', _HTML_BLOCK_PATTERN.sub(' ', body))
+    return _WHITESPACE_PATTERN.sub(' ', body).strip()[:PROMPT_BODY_CHARS]
+
+
+def _loads_json(text: str) -> Any:
+    """Parse a JSON response with orjson when available"""
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass  # e.g. NaN/Infinity, which only the stdlib parser accepts
+    return json.loads(text)
+
+
+# Model-emitted due dates repeat a lot ("tomorrow", "2024-06-15"), so the
+# now-independent parts of _parse_due_date are memoized
+@lru_cache(maxsize=2048)
+def _parse_absolute_date(date_str: str) -> Optional[datetime]:
+    """Parse an ISO or fallback-format date, or return None"""
+    # ISO dates/datetimes (the format the prompt asks for)
+    try:
+        parsed = datetime.fromisoformat(date_str)
+    except ValueError:
+        pass
+    else:
+        # Offsets are allowed in ISO strings; stored due dates are naive UTC
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    
+    for pattern in _FALLBACK_DATE_PATTERNS:
+        try:
+            return datetime.strptime(date_str, pattern)
+        except ValueError:
+            continue
+    return None
+
+
+@lru_cache(maxsize=2048)
+def _relative_date_keyword(date_str: str) -> Optional[str]:
+    """Return the relative-date keyword that applies to date_str, if any"""
+    matches = set(_RELATIVE_DATE_PATTERN.findall(date_str.lower()))
+    if not matches:
+        return None
+    return next(k for k in _RELATIVE_DATE_PRIORITY if k in matches)
+
+
+class _RequestRateLimiter:
+    """
+    Async request spacing for a requests-per-minute budget
+    
+    Each acquire() reserves the next free slot, so concurrent callers queue up
+    at 60/rpm second intervals instead of sleeping a fixed time per email.
+    A non-positive rpm disables limiting.
+    """
+    
+    def __init__(self, requests_per_minute: int):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+    
+    async def acquire(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+# Clients are built once per process and shared by every EmailProcessor
+@lru_cache(maxsize=1)
+def _openai_client() -> OpenAI:
+    return OpenAI(api_key=settings.openai_api_key)
+
+
+@lru_cache(maxsize=1)
+def _async_openai_client() -> AsyncOpenAI:
+    return AsyncOpenAI(api_key=settings.openai_api_key)
+
+
+@lru_cache(maxsize=1)
+def _openai_rate_limiter() -> _RequestRateLimiter:
+    # One budget per process: the OpenAI limit applies to the API key
+    return _RequestRateLimiter(settings.openai_rpm)
+
+
+@lru_cache(maxsize=1)
+def _langchain_llm():
+    # Imported lazily: LangChain is heavy and only needed by callers that use it
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model="gpt-4o-mini",
+        temperature=0.3,
+        openai_api_key=settings.openai_api_key
+    )
+
 
 class EmailProcessor:
     def __init__(self):
-        self.openai_client = OpenAI(api_key=settings.openai_api_key)
-        self.langchain_llm = ChatOpenAI(
-            model="gpt-4o-mini",
-            temperature=0.3,
-            openai_api_key=settings.openai_api_key
-        )
+        self.openai_client = _openai_client()
+        self.async_openai_client = _async_openai_client()
+        self.rate_limiter = _openai_rate_limiter()
         self.tasks_service = GoogleTasksService()
+        # The Tasks client's HTTP connection is not thread-safe; one batch at a time
+        self._tasks_lock = asyncio.Lock()
+    
+    @property
+    def langchain_llm(self):
+        """Shared LangChain chat model, created on first use"""
+        return _langchain_llm()
         
-    def process_email(self, email: Email) -> Dict[str, Any]:
+    async def process_email(self, email: Email, db: Session,
+                            batch_now: Optional[datetime] = None,
+                            batch_utcnow: Optional[datetime] = None,
+                            db_lock: Optional[asyncio.Lock] = None,
+                            content: Optional[EmailContent] = None) -> Dict[str, Any]:
         """
         Process a single email through the complete AI pipeline
         
+        Writes are added to db; the caller commits, and successful results
+        are queued in db.info['pending_results'] so a failed commit can mark
+        them as errors. Batch callers pass the batch start time (local and
+        UTC) so it is read once per batch, the lock that serializes
+        worker-thread use of db, and the email's content copied at load time
+        (a rollback expires the instance, and the loop must not reload it).
+        
         Returns:
             Dictionary with processing results
         """
         start_time = time.time()
         total_tokens = 0
         total_cost = 0.0
+        db_lock = db_lock or asyncio.Lock()
+        content = content or _email_content(email)
+        email_id = content.id
+        subject = content.subject or ''
         
         try:
-            logger.info(f"Processing email: {email.subject[:50]}...")
+            logger.info(f"Processing email: {subject[:50]}...")
             
-            # Step 1: Analyze email importance and sentiment
-            importance_result = self._analyze_importance(email)
-            if importance_result is None:
+            # Steps 1-3: Analyze importance, summarize and extract tasks in one request
+            analysis = await self._analyze_email(content, batch_now)
+            if analysis is None:
                 # API quota exceeded - skip AI processing
-                logger.info(f"Skipping AI processing for email {email.id} due to API quota limits")
+                logger.info(f"Skipping AI processing for email {email_id} due to API quota limits")
                 return {
                     'success': False,
-                    'email_id': email.id,
+                    'email_id': email_id,
                     'error': 'OpenAI API quota exceeded',
                     'processing_time': time.time() - start_time
                 }
+            importance_result, summary_result, tasks_result = analysis
             total_tokens += importance_result.get('tokens_used', 0)
             total_cost += importance_result.get('cost', 0)
             
-            # Step 2: Generate summary
-            summary_result = self._generate_summary(email)
-            if summary_result is None:
-                # Use fallback summary
-                summary_result = {
-                    'summary': f"Email from {email.sender}: {email.subject}",
-                    'tokens_used': 0,
-                    'cost': 0.0
-                }
-            total_tokens += summary_result.get('tokens_used', 0)
-            total_cost += summary_result.get('cost', 0)
-            
-            # Step 3: Extract action items/tasks
-            tasks_result = self._extract_tasks(email)
-            if tasks_result is None:
-                # Use fallback empty tasks
-                tasks_result = {
-                    'tasks': [],
-                    'tokens_used': 0,
-                    'cost': 0.0
-                }
-            total_tokens += tasks_result.get('tokens_used', 0)
-            total_cost += tasks_result.get('cost', 0)
-            
-            # Step 4: Update email record
-            self._update_email_record(
-                email, 
-                importance_result, 
-                summary_result, 
-                tasks_result,
-                total_tokens,
-                total_cost
-            )
-            
-            # Step 5: Create tasks in Google Tasks
-            created_tasks = []
-            if tasks_result.get('tasks'):
-                for task_data in tasks_result['tasks']:
-                    task_id = self._create_task_from_email(email, task_data)
-                    if task_id:
-                        created_tasks.append(task_id)
-            
-            processing_time = time.time() - start_time
-            
-            # Log successful processing
-            self._log_processing(
-                'email_process',
-                'success',
-                f"Processed email: {email.subject[:50]}",
-                {
-                    'email_id': email.id,
+            # Step 4: Create tasks in Google Tasks (one batch request per email),
+            # in a worker thread so the event loop keeps serving other work
+            confident_tasks = self._confident_tasks(tasks_result.get('tasks') or [])
+            google_task_ids = []
+            if confident_tasks:
+                async with self._tasks_lock:
+                    google_task_ids = await asyncio.to_thread(
+                        self.tasks_service.create_tasks_bulk, confident_tasks
+                    )
+            
+            # Step 5: Update email record, save tasks and log, off the event loop
+            def store_results() -> Dict[str, Any]:
+                self._update_email_record(
+                    db,
+                    email, 
+                    importance_result, 
+                    summary_result, 
+                    tasks_result,
+                    total_tokens,
+                    total_cost,
+                    batch_utcnow
+                )
+                created_tasks = self._save_email_tasks(db, email_id, confident_tasks, google_task_ids)
+                
+                # Log successful processing
+                self._log_processing(
+                    db,
+                    'email_process',
+                    'success',
+                    f"Processed email: {subject[:50]}",
+                    {
+                        'email_id': email_id,
+                        'importance_score': importance_result.get('importance_score', 0),
+                        'tasks_extracted': len(created_tasks),
+                        'summary_length': len(summary_result.get('summary', ''))
+                    },
+                    time.time() - start_time,
+                    total_tokens,
+                    total_cost
+                )
+                
+                result = {
+                    'success': True,
+                    'email_id': email_id,
                     'importance_score': importance_result.get('importance_score', 0),
-                    'tasks_extracted': len(created_tasks),
-                    'summary_length': len(summary_result.get('summary', ''))
-                },
-                processing_time,
-                total_tokens,
-                total_cost
-            )
+                    'summary': summary_result.get('summary', ''),
+                    'sentiment': importance_result.get('sentiment', 'neutral'),
+                    'tasks_created': created_tasks,
+                    'processing_time': time.time() - start_time,
+                    'tokens_used': total_tokens,
+                    'cost': total_cost
+                }
+                # Queued with the writes it reports; _commit_batch() fails it on rollback
+                db.info.setdefault('pending_results', []).append(result)
+                return result
             
-            return {
-                'success': True,
-                'email_id': email.id,
-                'importance_score': importance_result.get('importance_score', 0),
-                'summary': summary_result.get('summary', ''),
-                'sentiment': importance_result.get('sentiment', 'neutral'),
-                'tasks_created': created_tasks,
-                'processing_time': processing_time,
-                'tokens_used': total_tokens,
-                'cost': total_cost
-            }
+            return await self._in_session(db_lock, store_results)
             
         except Exception as e:
             processing_time = time.time() - start_time
-            logger.error(f"Error processing email {email.id}: {e}")
+            logger.error(f"Error processing email {email_id}: {e}")
             
             # Log error
-            self._log_processing(
+            await self._in_session(
+                db_lock,
+                self._log_processing,
+                db,
                 'email_process',
                 'error',
                 f"Failed to process email: {str(e)}",
-                {'email_id': email.id},
+                {'email_id': email_id},
                 processing_time,
                 total_tokens,
                 total_cost
@@ -142,21 +330,33 @@ class EmailProcessor:
             
             return {
                 'success': False,
-                'email_id': email.id,
+                'email_id': email_id,
                 'error': str(e),
                 'processing_time': processing_time
             }
     
-    def _analyze_importance(self, email: Email) -> Dict[str, Any]:
-        """Analyze email importance and sentiment"""
+    async def _analyze_email(self, email: EmailContent, now: Optional[datetime] = None) -> Optional[Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]]:
+        """
+        Analyze importance, summarize and extract tasks with a single completion
+        
+        Returns:
+            (importance_result, summary_result, tasks_result), or None if the
+            OpenAI quota is exhausted. Token usage and cost for the whole request
+            are reported on importance_result.
+        """
+        body = _prompt_body(email.body)
+        # Automated or keyword-free emails skip the task section of the prompt
+        extract_tasks = self._may_contain_tasks(email, body)
         prompt = f"""
-        Analyze this email for importance and sentiment:
+        Analyze this email:
         
         From: {email.sender}
         Subject: {email.subject}
-        Body: {email.body[:1000]}...
+        Body: {body}...
         
-        Return a JSON response with:
+        Return a single JSON object with these keys:
+        
+        "importance": an object with
         1. importance_score: float (0.0 to 1.0, where 1.0 is most important)
         2. sentiment: string ("positive", "negative", "neutral", "urgent")
         3. reasoning: string (brief explanation)
@@ -168,289 +368,256 @@ class EmailProcessor:
         - Content that requires action
         - Meeting requests, deadlines, client communications
         
-        JSON format only:
-        """
-        
-        try:
-            messages = [
-                {"role": "system", "content": "You are an expert email analyst. Return only valid JSON."},
-                {"role": "user", "content": prompt}
-            ]
-            
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                temperature=0.3,
-                max_tokens=300
-            )
-            
-            result = json.loads(response.choices[0].message.content)
-            
-            return {
-                **result,
-                'tokens_used': response.usage.total_tokens,
-                'cost': response.usage.total_tokens * 0.00003  # Approximate cost
-            }
-            
-        except Exception as e:
-            logger.error(f"Error analyzing importance: {e}")
-            # Check if it's a quota exceeded error
-            if "insufficient_quota" in str(e) or "429" in str(e):
-                logger.warning("OpenAI API quota exceeded - skipping AI analysis")
-                return None  # Signal to skip AI processing
-            return {
-                'importance_score': 0.5,
-                'sentiment': 'neutral',
-                'reasoning': 'Analysis failed',
-                'is_actionable': False,
-                'tokens_used': 0,
-                'cost': 0.0
-            }
-    
-    def _generate_summary(self, email: Email) -> Dict[str, Any]:
-        """Generate concise email summary"""
-        prompt = f"""
-        Summarize this email in 2-3 clear, actionable sentences:
-        
-        From: {email.sender}
-        Subject: {email.subject}
-        Body: {email.body[:2000]}...
-        
-        Requirements:
+        "summary": a string summarizing the email in 2-3 clear, actionable sentences:
         - Focus on key information and any actions needed
         - Use professional, clear language
         - Highlight deadlines or important dates
         - Keep it under 150 words
         
-        Summary:
+        {_TASKS_PROMPT_SECTION if extract_tasks else _NO_TASKS_PROMPT_SECTION}
         """
         
         try:
             messages = [
-                {"role": "system", "content": "You are an expert at creating concise, actionable email summaries."},
+                {"role": "system", "content": "You are an expert email analyst who summarizes emails and extracts actionable tasks. Return only valid JSON."},
                 {"role": "user", "content": prompt}
             ]
             
-            response = self.openai_client.chat.completions.create(
+            await self.rate_limiter.acquire()
+            response = await self.async_openai_client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=messages,
                 temperature=0.3,
-                max_tokens=200
-            )
-            
-            summary = response.choices[0].message.content.strip()
-            
-            return {
-                'summary': summary,
-                'tokens_used': response.usage.total_tokens,
-                'cost': response.usage.total_tokens * 0.00003
-            }
-            
-        except Exception as e:
-            logger.error(f"Error generating summary: {e}")
-            # Check if it's a quota exceeded error
-            if "insufficient_quota" in str(e) or "429" in str(e):
-                logger.warning("OpenAI API quota exceeded - using fallback summary")
-                return None  # Signal to skip AI processing
-            return {
-                'summary': f"Email from {email.sender}: {email.subject}",
-                'tokens_used': 0,
-                'cost': 0.0
-            }
-    
-    def _extract_tasks(self, email: Email) -> Dict[str, Any]:
-        """Extract actionable tasks from email"""
-        prompt = f"""
-        Extract actionable tasks from this email:
-        
-        From: {email.sender}
-        Subject: {email.subject}
-        Body: {email.body[:2000]}...
-        
-        Return a JSON response with an array of tasks. For each task include:
-        - title: string (concise task description)
-        - description: string (more details if needed)
-        - due_date: string (ISO format date if mentioned, null if not)
-        - priority: string ("low", "medium", "high", "urgent")
-        - confidence: float (0.0 to 1.0 - how confident you are this is a real task)
-        
-        Only extract tasks that are:
-        - Clearly actionable (not just FYI)
-        - Directed at the email recipient
-        - Specific enough to be acted upon
-        
-        If no clear tasks, return empty array.
-        
-        JSON format:
-        {{"tasks": [...]}}
-        """
-        
-        try:
-            messages = [
-                {"role": "system", "content": "You are an expert at extracting actionable tasks from emails. Return only valid JSON."},
-                {"role": "user", "content": prompt}
-            ]
-            
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                temperature=0.2,
-                max_tokens=500
+                max_tokens=1000 if extract_tasks else 400,
+                response_format={"type": "json_object"}
             )
             
-            result = json.loads(response.choices[0].message.content)
+            result = _loads_json(response.choices[0].message.content)
             
             # Parse and validate due dates
-            for task in result.get('tasks', []):
+            tasks = (result.get('tasks') or []) if extract_tasks else []
+            now = now or datetime.now()
+            for task in tasks:
                 if task.get('due_date'):
                     try:
-                        task['due_date'] = self._parse_due_date(task['due_date'])
+                        task['due_date'] = self._parse_due_date(task['due_date'], now)
                     except:
                         task['due_date'] = None
             
-            return {
-                **result,
+            importance_result = {
+                **(result.get('importance') or {}),
                 'tokens_used': response.usage.total_tokens,
-                'cost': response.usage.total_tokens * 0.00003
+                'cost': response.usage.total_tokens * 0.00003  # Approximate cost
             }
+            summary_result = {
+                'summary': (result.get('summary') or '').strip() or f"Email from {email.sender}: {email.subject}",
+                'tokens_used': 0,
+                'cost': 0.0
+            }
+            tasks_result = {'tasks': tasks, 'tokens_used': 0, 'cost': 0.0}
+            
+            return importance_result, summary_result, tasks_result
             
         except Exception as e:
-            logger.error(f"Error extracting tasks: {e}")
+            logger.error(f"Error analyzing email: {e}")
             # Check if it's a quota exceeded error
             if "insufficient_quota" in str(e) or "429" in str(e):
-                logger.warning("OpenAI API quota exceeded - skipping task extraction")
+                logger.warning("OpenAI API quota exceeded - skipping AI analysis")
                 return None  # Signal to skip AI processing
-            return {
-                'tasks': [],
-                'tokens_used': 0,
-                'cost': 0.0
-            }
+            return (
+                {
+                    'importance_score': 0.5,
+                    'sentiment': 'neutral',
+                    'reasoning': 'Analysis failed',
+                    'is_actionable': False,
+                    'tokens_used': 0,
+                    'cost': 0.0
+                },
+                {
+                    'summary': f"Email from {email.sender}: {email.subject}",
+                    'tokens_used': 0,
+                    'cost': 0.0
+                },
+                {
+                    'tasks': [],
+                    'tokens_used': 0,
+                    'cost': 0.0
+                }
+            )
+    
+    def _may_contain_tasks(self, email: EmailContent, body: str) -> bool:
+        """Cheap pre-filter: False for automated senders or emails without action keywords"""
+        if _AUTOMATED_SENDER_PATTERN.search(email.sender or ''):
+            return False
+        return bool(
+            _ACTION_KEYWORD_PATTERN.search(email.subject or '')
+            or _ACTION_KEYWORD_PATTERN.search(body, 0, 500)
+        )
     
-    def _parse_due_date(self, date_str: str) -> Optional[datetime]:
+    def _parse_due_date(self, date_str: str, now: Optional[datetime] = None) -> Optional[datetime]:
         """Parse various date formats into datetime"""
         if not date_str:
             return None
-            
-        # Common date patterns
-        patterns = [
-            "%Y-%m-%d",
-            "%Y-%m-%dT%H:%M:%S",
-            "%m/%d/%Y",
-            "%d/%m/%Y"
-        ]
-        
-        for pattern in patterns:
-            try:
-                return datetime.strptime(date_str, pattern)
-            except ValueError:
-                continue
+        
+        parsed = _parse_absolute_date(date_str)
+        if parsed is not None:
+            return parsed
         
         # Try relative dates
-        date_str_lower = date_str.lower()
-        today = datetime.now().replace(hour=17, minute=0, second=0, microsecond=0)  # Default to 5 PM
-        
-        if 'today' in date_str_lower:
-            return today
-        elif 'tomorrow' in date_str_lower:
-            return today + timedelta(days=1)
-        elif 'monday' in date_str_lower:
-            days_ahead = 0 - today.weekday()
-            if days_ahead <= 0:
-                days_ahead += 7
-            return today + timedelta(days=days_ahead)
-        elif 'friday' in date_str_lower:
-            days_ahead = 4 - today.weekday()
+        keyword = _relative_date_keyword(date_str)
+        if keyword is None:
+            return None
+        
+        now = now or datetime.now()
+        today = now.replace(hour=17, minute=0, second=0, microsecond=0)  # Default to 5 PM
+        
+        if keyword in _RELATIVE_WEEKDAYS:
+            days_ahead = _RELATIVE_WEEKDAYS[keyword] - today.weekday()
             if days_ahead <= 0:
                 days_ahead += 7
-            return today + timedelta(days=days_ahead)
-        elif 'next week' in date_str_lower:
-            return today + timedelta(days=7)
+        else:
+            days_ahead = _RELATIVE_DAY_OFFSETS[keyword]
         
-        return None
+        return today + timedelta(days=days_ahead)
     
-    def _update_email_record(self, email: Email, importance_result: Dict, 
+    def _update_email_record(self, db: Session, email: Email, importance_result: Dict, 
                            summary_result: Dict, tasks_result: Dict,
-                           total_tokens: int, total_cost: float):
-        """Update email record with processing results"""
-        db = SessionLocal()
-        try:
-            email.summary = summary_result.get('summary', '')
-            email.importance_score = importance_result.get('importance_score', 0.0)
-            email.sentiment = importance_result.get('sentiment', 'neutral')
-            email.has_action_items = len(tasks_result.get('tasks', [])) > 0
-            email.tokens_used = total_tokens
-            email.processing_cost = total_cost
-            email.status = EmailStatus.PROCESSED
-            email.processed_at = datetime.utcnow()
-            
-            db.commit()
-            
-        except Exception as e:
-            db.rollback()
-            logger.error(f"Error updating email record: {e}")
-        finally:
-            db.close()
+                           total_tokens: int, total_cost: float,
+                           processed_at: Optional[datetime] = None):
+        """Update email record with processing results (committed with the batch)"""
+        email.summary = summary_result.get('summary', '')
+        email.importance_score = importance_result.get('importance_score', 0.0)
+        email.sentiment = importance_result.get('sentiment', 'neutral')
+        email.has_action_items = len(tasks_result.get('tasks', [])) > 0
+        email.tokens_used = total_tokens
+        email.processing_cost = total_cost
+        email.status = EmailStatus.PROCESSED
+        email.processed_at = processed_at or datetime.utcnow()
+        db.add(email)
     
-    def _create_task_from_email(self, email: Email, task_data: Dict) -> Optional[int]:
-        """Create a task in the database and Google Tasks"""
-        try:
+    async def _in_session(self, db_lock: asyncio.Lock, func, *args):
+        """Run blocking work on a shared session in a worker thread, one call at a time"""
+        async with db_lock:
+            return await asyncio.to_thread(func, *args)
+    
+    def _confident_tasks(self, tasks: List[Dict]) -> List[Dict[str, Any]]:
+        """Extracted tasks worth creating, in the shape save_created_tasks() takes"""
+        confident_tasks = []
+        for task_data in tasks:
             # Only create tasks with reasonable confidence
             if task_data.get('confidence', 0) < 0.6:
                 logger.info(f"Skipping low-confidence task: {task_data.get('title')}")
-                return None
-            
-            task_id = self.tasks_service.save_task_to_db(
-                title=task_data['title'],
-                description=task_data.get('description', ''),
-                due_date=task_data.get('due_date'),
-                priority=task_data.get('priority', 'medium'),
-                email_id=email.id,
-                confidence_score=task_data.get('confidence', 0.0)
+                continue
+            confident_tasks.append({
+                'title': task_data['title'],
+                'description': task_data.get('description', ''),
+                'due_date': task_data.get('due_date'),
+                'priority': task_data.get('priority', 'medium'),
+                'confidence_score': task_data.get('confidence', 0.0)
+            })
+        return confident_tasks
+    
+    def _save_email_tasks(self, db: Session, email_id: int, tasks: List[Dict[str, Any]],
+                          google_task_ids: List[Optional[str]]) -> List[int]:
+        """Save the email's tasks that were created in Google Tasks to the database"""
+        try:
+            task_ids = self.tasks_service.save_created_tasks(
+                tasks, google_task_ids, email_id=email_id, db=db
             )
             
-            if task_id:
-                logger.info(f"Created task: {task_data['title']}")
+            if task_ids:
+                logger.info(f"Created {len(task_ids)} tasks for email {email_id}")
             
-            return task_id
+            return task_ids
             
         except Exception as e:
-            logger.error(f"Error creating task: {e}")
-            return None
+            logger.error(f"Error creating tasks: {e}")
+            return []
     
-    def _log_processing(self, operation: str, status: str, message: str, 
+    def _log_processing(self, db: Session, operation: str, status: str, message: str, 
                        details: Dict, duration: float, tokens: int, cost: float):
-        """Log processing operation"""
-        db = SessionLocal()
+        """Queue a processing log row; rows are bulk inserted with the batch"""
+        pending = db.info.setdefault('pending_logs', [])
+        pending.append({
+            'operation': operation,
+            'status': status,
+            'message': message,
+            'details': details,
+            'duration_seconds': duration,
+            'tokens_used': tokens,
+            'cost': cost
+        })
+        if len(pending) >= LOG_FLUSH_SIZE:
+            self._flush_logs(db)
+    
+    def _flush_logs(self, db: Session):
+        """Insert queued log rows with one Core executemany, bypassing the ORM flush"""
+        pending = db.info.pop('pending_logs', None)
+        if pending:
+            db.execute(insert(ProcessingLog), pending)
+    
+    def _commit_batch(self, db: Session) -> bool:
+        """
+        Commit pending batch writes, rolling back on failure
+        
+        Results queued by process_email() since the last commit are marked
+        failed if the commit does not go through, so their emails count as
+        errors and their tasks are not reported as created.
+        
+        Returns:
+            True if the batch was committed
+        """
+        pending_results = db.info.pop('pending_results', [])
         try:
-            log = ProcessingLog(
-                operation=operation,
-                status=status,
-                message=message,
-                details=details,
-                duration_seconds=duration,
-                tokens_used=tokens,
-                cost=cost
-            )
-            db.add(log)
+            self._flush_logs(db)
             db.commit()
+            return True
         except Exception as e:
-            logger.error(f"Error logging operation: {e}")
-        finally:
-            db.close()
+            db.rollback()
+            db.info.pop('pending_logs', None)
+            logger.error(f"Error committing processing batch of {len(pending_results)} emails: {e}")
+            for result in pending_results:
+                result.update(success=False, error=f"Batch commit failed: {e}", tasks_created=[])
+            return False
     
-    def process_unprocessed_emails(self) -> Dict[str, Any]:
-        """Process all unprocessed emails"""
-        db = SessionLocal()
-        try:
-            unprocessed_emails = db.query(Email).filter(
+    async def process_unprocessed_emails(self, email_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+        """
+        Process unprocessed emails, running up to settings.openai_concurrency at once
+        
+        Args:
+            email_ids: Only consider these emails; all unprocessed emails if None
+        """
+        # One session for the whole batch; keep loaded emails usable across commits.
+        # Every query and commit on it runs in a worker thread under db_lock.
+        db = SessionLocal(expire_on_commit=False)
+        db_lock = asyncio.Lock()
+        
+        def load_ids() -> List[int]:
+            query = db.query(Email).with_entities(Email.id).filter(
                 Email.status == EmailStatus.UNPROCESSED
+            )
+            if email_ids is not None:
+                query = query.filter(Email.id.in_(email_ids))
+            return [row.id for row in query.order_by(Email.received_at.desc())]
+        
+        def load_window(window_ids: List[int]) -> List[Tuple[Email, EmailContent]]:
+            window = db.query(Email).options(
+                selectinload(Email.body_record)
+            ).filter(
+                Email.id.in_(window_ids)
             ).order_by(Email.received_at.desc()).all()
+            return [(email, _email_content(email)) for email in window]
+        
+        try:
+            # Fetch only IDs up front, then load full emails (with bodies) one
+            # window at a time so a large backlog never sits in memory at once
+            email_ids = await self._in_session(db_lock, load_ids)
             
-            if not unprocessed_emails:
+            if not email_ids:
                 logger.info("No unprocessed emails found")
                 return {'processed': 0, 'errors': 0, 'total_cost': 0.0}
             
-            logger.info(f"Processing {len(unprocessed_emails)} unprocessed emails")
+            logger.info(f"Processing {len(email_ids)} unprocessed emails")
             
             results = {
                 'processed': 0,
@@ -460,9 +627,38 @@ class EmailProcessor:
                 'tasks_created': 0
             }
             
-            for email in unprocessed_emails:
-                result = self.process_email(email)
+            # Bound in-flight OpenAI requests instead of sleeping between emails
+            semaphore = asyncio.Semaphore(settings.openai_concurrency)
+            # Read the clock once for relative due dates and processed_at
+            batch_now = datetime.now()
+            batch_utcnow = datetime.utcnow()
+            completed = 0
+            
+            async def process_bounded(email: Email, content: EmailContent) -> Dict[str, Any]:
+                nonlocal completed
+                async with semaphore:
+                    result = await self.process_email(
+                        email, db, batch_now, batch_utcnow, db_lock, content
+                    )
+                
+                completed += 1
+                if completed % COMMIT_BATCH_SIZE == 0:
+                    await self._in_session(db_lock, self._commit_batch, db)
+                return result
+            
+            email_results = []
+            for start in range(0, len(email_ids), FETCH_BATCH_SIZE):
+                window = await self._in_session(
+                    db_lock, load_window, email_ids[start:start + FETCH_BATCH_SIZE]
+                )
                 
+                email_results.extend(await asyncio.gather(
+                    *(process_bounded(email, content) for email, content in window)
+                ))
+                await self._in_session(db_lock, self._commit_batch, db)
+                await self._in_session(db_lock, db.expunge_all)  # Release the window's emails and bodies
+            
+            for result in email_results:
                 if result['success']:
                     results['processed'] += 1
                     results['total_cost'] += result.get('cost', 0)
@@ -470,9 +666,6 @@ class EmailProcessor:
                     results['tasks_created'] += len(result.get('tasks_created', []))
                 else:
                     results['errors'] += 1
-                
-                # Small delay to avoid rate limiting
-                time.sleep(1)
             
             logger.info(f"Processing complete: {results}")
             return results
@@ -481,7 +674,7 @@ class EmailProcessor:
             logger.error(f"Error processing emails: {e}")
             return {'processed': 0, 'errors': 1, 'total_cost': 0.0}
         finally:
-            db.close()
+            await self._in_session(db_lock, db.close)
     
     def generate_daily_summary(self, date: datetime = None) -> Dict[str, Any]:
         """Generate AI summary of the day's emails and tasks"""
@@ -493,20 +686,33 @@ class EmailProcessor:
         
         db = SessionLocal()
         try:
-            # Get today's processed emails
-            emails = db.query(Email).filter(
+            processed_today = (
                 Email.processed_at >= start_date,
                 Email.processed_at < end_date,
                 Email.status == EmailStatus.PROCESSED
-            ).all()
+            )
+            
+            # Aggregate today's processed emails in the database
+            email_stats = db.query(
+                func.count(Email.id),
+                func.count(case((Email.importance_score > 0.7, 1))),
+                func.sum(Email.processing_cost),
+                func.avg(Email.importance_score)
+            ).filter(*processed_today).one()
+            emails_processed, important_emails, total_cost, avg_importance = email_stats
+            
+            # Only the emails quoted in the summary prompt are loaded
+            top_emails = db.query(Email.sender, Email.summary).filter(
+                *processed_today
+            ).order_by(Email.importance_score.desc()).limit(10).all()
             
             # Get today's tasks
-            tasks = db.query(Task).filter(
+            tasks = db.query(Task.title, Task.due_date, Task.priority).filter(
                 Task.created_at >= start_date,
                 Task.created_at < end_date
             ).all()
             
-            if not emails and not tasks:
+            if not emails_processed and not tasks:
                 return {
                     'summary': "No emails or tasks processed today.",
                     'stats': {
@@ -517,17 +723,17 @@ class EmailProcessor:
                 }
             
             # Generate summary using AI
-            summary_prompt = self._build_daily_summary_prompt(emails, tasks)
+            summary_prompt = self._build_daily_summary_prompt(top_emails, tasks, emails_processed)
             summary = self._generate_ai_summary(summary_prompt)
             
             # Calculate statistics
             stats = {
-                'emails_processed': len(emails),
-                'important_emails': len([e for e in emails if e.importance_score > 0.7]),
+                'emails_processed': emails_processed,
+                'important_emails': important_emails,
                 'tasks_created': len(tasks),
-                'high_priority_tasks': len([t for t in tasks if t.priority in ['high', 'urgent']]),
-                'total_cost': sum(e.processing_cost or 0 for e in emails),
-                'avg_importance': sum(e.importance_score or 0 for e in emails) / len(emails) if emails else 0
+                'high_priority_tasks': sum(1 for t in tasks if t.priority in ['high', 'urgent']),
+                'total_cost': total_cost or 0,
+                'avg_importance': avg_importance or 0
             }
             
             return {
@@ -546,25 +752,29 @@ class EmailProcessor:
         finally:
             db.close()
     
-    def _build_daily_summary_prompt(self, emails: List[Email], tasks: List[Task]) -> str:
-        """Build prompt for daily summary generation"""
-        email_summaries = []
-        for email in emails[:10]:  # Limit to top 10 emails
-            email_summaries.append(f"• From {email.sender}: {email.summary}")
+    def _build_daily_summary_prompt(self, emails: List[Any], tasks: List[Any], email_count: int) -> str:
+        """
+        Build prompt for daily summary generation
         
-        task_summaries = []
-        for task in tasks:
-            due_str = f" (due {task.due_date.strftime('%Y-%m-%d')})" if task.due_date else ""
-            task_summaries.append(f"• {task.title}{due_str} [{task.priority} priority]")
+        `emails` holds the top emails to quote (sender, summary) and
+        `email_count` the total processed today.
+        """
+        email_summaries = _NL.join([
+            f"• From {email.sender}: {email.summary}" for email in emails
+        ])
+        task_summaries = _NL.join([
+            f"• {task.title}{f' (due {task.due_date:%Y-%m-%d})' if task.due_date else ''} [{task.priority} priority]"
+            for task in tasks
+        ])
         
         prompt = f"""
         Create a concise daily summary for today's email processing:
         
-        EMAILS PROCESSED ({len(emails)} total):
-        {chr(10).join(email_summaries)}
+        EMAILS PROCESSED ({email_count} total):
+        {email_summaries}
         
         TASKS EXTRACTED ({len(tasks)} total):
-        {chr(10).join(task_summaries)}
+        {task_summaries}
         
         Create a 3-4 sentence summary highlighting:
         1. Key themes from today's emails
@@ -589,7 +799,8 @@ class EmailProcessor:
                 model="gpt-4o-mini",
                 messages=messages,
                 temperature=0.3,
-                max_tokens=300
+                max_tokens=200,  # 3-4 sentences
+                stop=_SUMMARY_STOP_SEQUENCES
             )
             
             return response.choices[0].message.content.strip()
@@ -1,8 +1,12 @@
 import os
 import pickle
 import base64
+import codecs
+import hashlib
+import json
+import threading
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
@@ -11,10 +15,12 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from sqlalchemy import select
 
 from config import settings
 from db.models import Email, EmailStatus
-from db.database import SessionLocal
+from db.database import SessionLocal, INSERT_PAGE_SIZE
+from db.bulk import bulk_insert_emails
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,6 +32,83 @@ SCOPES = [
     'https://www.googleapis.com/auth/tasks'
 ]
 
+# Message reads per HTTP batch request (Gmail rate-limits batches above 50)
+GMAIL_BATCH_SIZE = 50
+# gmail_ids per IN (...) lookup of stored emails
+IN_QUERY_CHUNK_SIZE = 500
+# Message IDs per batchModify call (the API maximum)
+GMAIL_MODIFY_BATCH_SIZE = 1000
+# Headers requested for header-only (format='metadata') fetches
+METADATA_HEADERS = ['From', 'Subject', 'Date']
+# Characters of body text kept per email
+MAX_BODY_CHARS = 5000
+
+
+# Parsed token files by (path, scopes), tagged with the file's mtime so a
+# rewritten token is reloaded; shared by every service constructed in-process,
+# so the Gmail and Tasks services (same SCOPES) use one Credentials object
+_credentials_cache: Dict[tuple, tuple] = {}
+# Digest of each token file's contents as last read or written
+_token_digests: Dict[str, bytes] = {}
+# Serializes load/refresh so services built concurrently refresh the token once
+_credentials_lock = threading.Lock()
+
+
+def _token_digest(token_json: str) -> bytes:
+    return hashlib.blake2b(token_json.encode(), digest_size=16).digest()
+
+
+def load_cached_credentials(token_file: str, scopes: List[str]) -> Credentials:
+    """Load authorized-user credentials, reusing the parsed token while the file is unchanged"""
+    key = (token_file, tuple(scopes))
+    mtime_ns = os.stat(token_file).st_mtime_ns
+    cached = _credentials_cache.get(key)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+    
+    with open(token_file) as token:
+        token_json = token.read()
+    creds = Credentials.from_authorized_user_info(json.loads(token_json), scopes)
+    _token_digests[token_file] = _token_digest(token_json)
+    _credentials_cache[key] = (mtime_ns, creds)
+    return creds
+
+
+def save_credentials(token_file: str, scopes: List[str], creds: Credentials):
+    """Write credentials to token_file unless it already holds exactly this token"""
+    token_json = creds.to_json()
+    digest = _token_digest(token_json)
+    if _token_digests.get(token_file) != digest or not os.path.exists(token_file):
+        with open(token_file, 'w') as token:
+            token.write(token_json)
+        _token_digests[token_file] = digest
+    # Record the credentials so the next load skips the parse
+    _credentials_cache[(token_file, tuple(scopes))] = (os.stat(token_file).st_mtime_ns, creds)
+
+
+def load_valid_credentials(token_file: str, scopes: List[str]) -> Optional[Credentials]:
+    """Credentials from token_file, refreshed and saved if expired; None if the user must log in"""
+    with _credentials_lock:
+        if not os.path.exists(token_file):
+            return None
+        try:
+            creds = load_cached_credentials(token_file, scopes)
+        except Exception as e:
+            logger.error(f"Error loading credentials: {e}")
+            return None
+        
+        if creds.valid:
+            return creds
+        if creds.expired and creds.refresh_token:
+            try:
+                creds.refresh(Request())
+            except Exception as e:
+                logger.error(f"Error refreshing credentials: {e}")
+                return None
+            save_credentials(token_file, scopes, creds)
+            return creds
+        return None
+
 
 class GmailService:
     def __init__(self):
@@ -35,55 +118,74 @@ class GmailService:
     
     def _authenticate(self):
         """Authenticate with Gmail API using OAuth2"""
-        creds = None
-        
-        # Load existing credentials
-        if os.path.exists(settings.google_token_file):
-            try:
-                creds = Credentials.from_authorized_user_file(settings.google_token_file, SCOPES)
-            except Exception as e:
-                logger.error(f"Error loading credentials: {e}")
+        # Load existing credentials, refreshing them if expired
+        creds = load_valid_credentials(settings.google_token_file, SCOPES)
         
         # If there are no (valid) credentials available, let the user log in
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                try:
-                    creds.refresh(Request())
-                except Exception as e:
-                    logger.error(f"Error refreshing credentials: {e}")
-                    creds = None
-            
-            if not creds:
-                if not os.path.exists(settings.google_credentials_file):
-                    raise FileNotFoundError(
-                        f"Google credentials file not found: {settings.google_credentials_file}. "
-                        "Please run configure_google.py first."
-                    )
-                
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    settings.google_credentials_file, SCOPES
+        if not creds:
+            if not os.path.exists(settings.google_credentials_file):
+                raise FileNotFoundError(
+                    f"Google credentials file not found: {settings.google_credentials_file}. "
+                    "Please run configure_google.py first."
                 )
-                creds = flow.run_local_server(port=0)
+            
+            flow = InstalledAppFlow.from_client_secrets_file(
+                settings.google_credentials_file, SCOPES
+            )
+            creds = flow.run_local_server(port=0)
             
             # Save the credentials for the next run
-            with open(settings.google_token_file, 'w') as token:
-                token.write(creds.to_json())
+            save_credentials(settings.google_token_file, SCOPES, creds)
         
         self.credentials = creds
-        self.service = build('gmail', 'v1', credentials=creds)
+        # Use the discovery document bundled with google-api-python-client
+        # instead of fetching it from googleapis.com on every construction
+        self.service = build(
+            'gmail', 'v1', credentials=creds,
+            static_discovery=True, cache_discovery=False
+        )
         logger.info("Gmail API authenticated successfully")
     
-    def get_recent_emails(self, max_results: int = 50, hours_back: int = 24) -> List[Dict[str, Any]]:
+    def get_recent_emails(self, max_results: int = 50, hours_back: int = 24,
+                          header_only: bool = False,
+                          skip_stored: bool = False) -> List[Dict[str, Any]]:
         """
         Fetch recent emails from Gmail
         
         Args:
             max_results: Maximum number of emails to fetch
             hours_back: How many hours back to search
+            header_only: Fetch only From/Subject/Date (body is left empty)
+            skip_stored: Leave out messages already saved to the database,
+                without fetching their details
         
         Returns:
             List of email dictionaries
         """
+        emails = []
+        for batch in self.iter_recent_email_batches(max_results, hours_back,
+                                                    header_only, skip_stored):
+            emails.extend(batch)
+        return emails
+    
+    def iter_recent_email_batches(self, max_results: int = 50, hours_back: int = 24,
+                                  header_only: bool = False,
+                                  skip_stored: bool = False) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Like get_recent_emails, but yield emails one HTTP batch
+        (GMAIL_BATCH_SIZE messages) at a time as they arrive
+        """
+        message_ids = self._list_recent_message_ids(max_results, hours_back, skip_stored)
+        for start in range(0, len(message_ids), GMAIL_BATCH_SIZE):
+            batch = self._fetch_message_batch(
+                message_ids[start:start + GMAIL_BATCH_SIZE], header_only
+            )
+            if batch:
+                yield batch
+    
+    def _list_recent_message_ids(self, max_results: int, hours_back: int,
+                                 skip_stored: bool) -> List[str]:
+        """IDs of recent messages matching the configured filters; empty on API errors"""
         try:
             # Calculate date filter
             since_date = datetime.now() - timedelta(hours=hours_back)
@@ -115,18 +217,13 @@ class GmailService:
             
             logger.info(f"Found {len(messages)} messages")
             
-            # Fetch full message details
-            emails = []
-            for message in messages:
-                try:
-                    email_data = self._get_message_details(message['id'])
-                    if email_data:
-                        emails.append(email_data)
-                except Exception as e:
-                    logger.error(f"Error processing message {message['id']}: {e}")
-                    continue
+            if skip_stored:
+                messages = self._filter_stored_messages(messages)
+                if not messages:
+                    logger.info("All messages are already stored")
+                    return []
             
-            return emails
+            return [message['id'] for message in messages]
             
         except HttpError as error:
             logger.error(f"Gmail API error: {error}")
@@ -135,22 +232,93 @@ class GmailService:
             logger.error(f"Error fetching emails: {e}")
             return []
     
-    def _get_message_details(self, message_id: str) -> Optional[Dict[str, Any]]:
-        """Get detailed information for a specific message"""
+    def _filter_stored_messages(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop listed messages whose gmail_id is already in the database (one IN query)"""
+        db = SessionLocal()
         try:
-            message = self.service.users().messages().get(
+            stored_ids = self._stored_email_ids(db, [message['id'] for message in messages])
+        finally:
+            db.close()
+        return [message for message in messages if message['id'] not in stored_ids]
+    
+    def _stored_email_ids(self, db, gmail_ids) -> Dict[str, int]:
+        """Map the given gmail_ids that are already stored to their email IDs"""
+        gmail_ids = list(gmail_ids)
+        stored = {}
+        # Chunked so the IN list stays under SQLite's bound-parameter limit
+        for start in range(0, len(gmail_ids), IN_QUERY_CHUNK_SIZE):
+            stored.update(db.execute(
+                select(Email.gmail_id, Email.id).where(
+                    Email.gmail_id.in_(gmail_ids[start:start + IN_QUERY_CHUNK_SIZE])
+                )
+            ).tuples())
+        return stored
+    
+    def _fetch_message_batch(self, message_ids: List[str],
+                             header_only: bool = False) -> List[Dict[str, Any]]:
+        """Fetch up to GMAIL_BATCH_SIZE messages in one HTTP batch request"""
+        fetched = {}
+        
+        def collect(request_id, response, exception):
+            # Callbacks run sequentially inside batch.execute()
+            if exception is not None:
+                logger.error(f"Error getting message details for {request_id}: {exception}")
+                return
+            email_data = self._parse_message(response, header_only)
+            if email_data:
+                fetched[request_id] = email_data
+        
+        batch = self.service.new_batch_http_request(callback=collect)
+        for message_id in message_ids:
+            batch.add(
+                self._message_get_request(message_id, header_only),
+                request_id=message_id
+            )
+        try:
+            batch.execute()
+        except Exception as e:
+            logger.error(f"Error fetching message batch: {e}")
+        
+        # Keep the order the messages were listed in
+        return [fetched[message_id] for message_id in message_ids if message_id in fetched]
+    
+    def _message_get_request(self, message_id: str, header_only: bool = False):
+        """Build a messages.get request; header_only skips the MIME tree and bodies"""
+        if header_only:
+            return self.service.users().messages().get(
                 userId='me',
                 id=message_id,
-                format='full'
-            ).execute()
-            
+                format='metadata',
+                metadataHeaders=METADATA_HEADERS
+            )
+        return self.service.users().messages().get(
+            userId='me',
+            id=message_id,
+            format='full'
+        )
+    
+    def _get_message_details(self, message_id: str,
+                             header_only: bool = False) -> Optional[Dict[str, Any]]:
+        """Get detailed information for a specific message"""
+        try:
+            message = self._message_get_request(message_id, header_only).execute()
+            return self._parse_message(message, header_only)
+        except Exception as e:
+            logger.error(f"Error getting message details for {message_id}: {e}")
+            return None
+    
+    def _parse_message(self, message: Dict[str, Any],
+                       header_only: bool = False) -> Optional[Dict[str, Any]]:
+        """Convert a full-format Gmail message resource into an email dictionary"""
+        message_id = message.get('id')
+        try:
             # Extract headers
             headers = {}
             for header in message['payload'].get('headers', []):
                 headers[header['name'].lower()] = header['value']
             
-            # Extract body
-            body = self._extract_message_body(message['payload'])
+            # Extract body (metadata responses carry none)
+            body = '' if header_only else self._extract_message_body(message['payload'])
             
             # Parse date
             received_at = self._parse_email_date(headers.get('date', ''))
@@ -166,36 +334,44 @@ class GmailService:
             }
             
         except Exception as e:
-            logger.error(f"Error getting message details for {message_id}: {e}")
+            logger.error(f"Error parsing message {message_id}: {e}")
             return None
     
     def _extract_message_body(self, payload: Dict[str, Any]) -> str:
-        """Extract text body from email payload"""
+        """Extract text body from email payload, decoding at most MAX_BODY_CHARS"""
         body = ""
         
         if 'parts' in payload:
             # Multipart message
             for part in payload['parts']:
+                remaining = MAX_BODY_CHARS - len(body)
+                if remaining <= 0:
+                    break
                 if part['mimeType'] == 'text/plain':
                     if 'data' in part['body']:
-                        body += base64.urlsafe_b64decode(
-                            part['body']['data']
-                        ).decode('utf-8')
+                        body += self._decode_body_data(part['body']['data'], remaining)
                 elif part['mimeType'] == 'text/html' and not body:
                     # Fallback to HTML if no plain text
                     if 'data' in part['body']:
-                        body += base64.urlsafe_b64decode(
-                            part['body']['data']
-                        ).decode('utf-8')
+                        body += self._decode_body_data(part['body']['data'], remaining)
         else:
             # Single part message
             if payload['mimeType'] in ['text/plain', 'text/html']:
                 if 'data' in payload['body']:
-                    body = base64.urlsafe_b64decode(
-                        payload['body']['data']
-                    ).decode('utf-8')
+                    body = self._decode_body_data(payload['body']['data'], MAX_BODY_CHARS)
         
-        return body[:5000]  # Limit body length
+        return body[:MAX_BODY_CHARS]  # Limit body length
+    
+    def _decode_body_data(self, data: str, max_chars: int) -> str:
+        """Decode base64url part data, decoding only enough for max_chars characters"""
+        # A character is at most 4 UTF-8 bytes; every 3 bytes are 4 base64 chars
+        encoded_limit = -(-max_chars * 4 // 3) * 4
+        if len(data) <= encoded_limit:
+            return base64.urlsafe_b64decode(data).decode('utf-8')
+        
+        raw = base64.urlsafe_b64decode(data[:encoded_limit])
+        # Non-final decode drops a character cut off at the slice boundary
+        return codecs.getincrementaldecoder('utf-8')().decode(raw)[:max_chars]
     
     def _parse_email_date(self, date_str: str) -> datetime:
         """Parse email date string to datetime"""
@@ -211,27 +387,35 @@ class GmailService:
         email_ids = []
         
         try:
+            # One query for every email that is already stored
+            existing_ids = self._stored_email_ids(
+                db, {email_data['gmail_id'] for email_data in emails}
+            )
+            email_ids.extend(existing_ids.values())
+            
+            new_rows = []
+            seen_gmail_ids = set(existing_ids)
             for email_data in emails:
-                # Check if email already exists
-                existing = db.query(Email).filter(
-                    Email.gmail_id == email_data['gmail_id']
-                ).first()
-                
-                if not existing:
-                    email = Email(
-                        gmail_id=email_data['gmail_id'],
-                        thread_id=email_data['thread_id'],
-                        sender=email_data['sender'],
-                        subject=email_data['subject'],
-                        body=email_data['body'],
-                        received_at=email_data['received_at'],
-                        status=EmailStatus.UNPROCESSED
-                    )
-                    db.add(email)
-                    db.flush()  # Get the ID
-                    email_ids.append(email.id)
-                else:
-                    email_ids.append(existing.id)
+                if email_data['gmail_id'] in seen_gmail_ids:
+                    continue
+                seen_gmail_ids.add(email_data['gmail_id'])
+                new_rows.append({
+                    'gmail_id': email_data['gmail_id'],
+                    'thread_id': email_data['thread_id'],
+                    'sender': email_data['sender'],
+                    'subject': email_data['subject'],
+                    'body': email_data['body'],
+                    'received_at': email_data['received_at'],
+                    'status': EmailStatus.UNPROCESSED
+                })
+            
+            # Insert new emails INSERT_PAGE_SIZE rows per statement inside one
+            # transaction; rows another run stored since the lookup above are
+            # skipped rather than failing the batch
+            for start in range(0, len(new_rows), INSERT_PAGE_SIZE):
+                email_ids.extend(bulk_insert_emails(
+                    db, new_rows[start:start + INSERT_PAGE_SIZE], ignore_duplicates=True
+                ))
             
             db.commit()
             logger.info(f"Saved {len(email_ids)} emails to database")
@@ -247,14 +431,21 @@ class GmailService:
     
     def mark_email_as_read(self, gmail_id: str):
         """Mark email as read in Gmail"""
-        try:
-            self.service.users().messages().modify(
-                userId='me',
-                id=gmail_id,
-                body={'removeLabelIds': ['UNREAD']}
-            ).execute()
-        except Exception as e:
-            logger.error(f"Error marking email as read: {e}")
+        self.mark_emails_as_read([gmail_id])
+    
+    def mark_emails_as_read(self, gmail_ids: List[str]):
+        """Mark emails as read in Gmail, GMAIL_MODIFY_BATCH_SIZE per batchModify call"""
+        for start in range(0, len(gmail_ids), GMAIL_MODIFY_BATCH_SIZE):
+            try:
+                self.service.users().messages().batchModify(
+                    userId='me',
+                    body={
+                        'ids': gmail_ids[start:start + GMAIL_MODIFY_BATCH_SIZE],
+                        'removeLabelIds': ['UNREAD']
+                    }
+                ).execute()
+            except Exception as e:
+                logger.error(f"Error marking emails as read: {e}")
     
     def send_email(self, to: str, subject: str, body: str, html_body: str = None):
         """Send an email"""
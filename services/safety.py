@@ -1,5 +1,11 @@
+import hashlib
 import logging
 import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from typing import Dict, Any, List, Optional
 from openai import OpenAI
 from config import settings
@@ -9,6 +15,45 @@ import json
 
 logger = logging.getLogger(__name__)
 
+# Shouting and spam heuristics used by SafetyService._pattern_moderation
+_CAPS_PATTERN = re.compile(r'[A-Z]{5,}')
+_SPAM_PATTERN = re.compile(r'(click here|buy now|limited time)', re.IGNORECASE)
+
+# Moderation results by SHA-256 of the content (LRU, failures are not cached)
+MODERATION_CACHE_SIZE = 4096
+_moderation_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+# Guards _moderation_cache; it is read and reordered from the executor's threads
+_moderation_cache_lock = threading.Lock()
+
+# Runs moderation requests so they overlap with the local checks; the local
+# checks stay on the caller's thread since they are CPU-bound
+_moderation_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="moderation")
+
+# Tags inspected by ContentValidator.validate_html_content
+_IMG_TAG_PATTERN = re.compile(r'<img[^>]*>')
+_LINK_TAG_PATTERN = re.compile(r'<a[^>]*>')
+
+# MonitoringService.check_system_health result reuse window, and the model
+# looked up to verify the OpenAI key
+HEALTH_CACHE_TTL_SECONDS = 30
+HEALTH_CHECK_MODEL = "gpt-4o-mini"
+
+# Literal phrases flagged by SafetyService._basic_plagiarism_check
+COMMON_COPIED_PHRASES = (
+    "according to wikipedia",
+    "as stated in the documentation",
+    "copy and paste",
+    "lorem ipsum",
+)
+_COPIED_PHRASE_PATTERN = re.compile(
+    '|'.join(re.escape(phrase) for phrase in COMMON_COPIED_PHRASES), re.IGNORECASE
+)
+
+
+def _more_matches_than(pattern: "re.Pattern", text: str, limit: int) -> bool:
+    """True if pattern matches text more than limit times; stops scanning once it does"""
+    return sum(1 for _ in islice(pattern.finditer(text), limit + 1)) > limit
+
 
 class SafetyService:
     def __init__(self):
@@ -18,6 +63,12 @@ class SafetyService:
             r'\b(hate speech|racist|sexist)\b',
             r'\b(illegal|piracy|crack)\b',
         ]
+        # One alternation with a named group per pattern, so the text is
+        # scanned once and each match still names the pattern it came from
+        self._blocked_regex = re.compile(
+            '|'.join(f'(?P<p{i}>{pattern})' for i, pattern in enumerate(self.blocked_patterns)),
+            re.IGNORECASE
+        )
         
     def moderate_content(self, content: str, title: str = "") -> Dict[str, Any]:
         """
@@ -34,25 +85,30 @@ class SafetyService:
             "confidence": 1.0
         }
         
-        # OpenAI Moderation API
-        openai_result = self._openai_moderation(content)
+        # OpenAI Moderation API, in the background while the local checks run
+        openai_future = _moderation_executor.submit(self._openai_moderation, content)
+        
+        # Custom pattern matching
+        pattern_result = self._pattern_moderation(content, title)
+        
+        # Content quality checks
+        quality_result = self._quality_checks(content, title)
+        
+        # Plagiarism check (basic)
+        plagiarism_result = self._basic_plagiarism_check(content)
+        
+        openai_result = openai_future.result()
         if not openai_result["safe"]:
             results["safe"] = False
             results["issues"].extend(openai_result["issues"])
         
-        # Custom pattern matching
-        pattern_result = self._pattern_moderation(content, title)
         if not pattern_result["safe"]:
             results["safe"] = False
             results["issues"].extend(pattern_result["issues"])
         
-        # Content quality checks
-        quality_result = self._quality_checks(content, title)
         results["warnings"].extend(quality_result["warnings"])
         results["recommendations"].extend(quality_result["recommendations"])
         
-        # Plagiarism check (basic)
-        plagiarism_result = self._basic_plagiarism_check(content)
         if plagiarism_result["warnings"]:
             results["warnings"].extend(plagiarism_result["warnings"])
         
@@ -62,7 +118,28 @@ class SafetyService:
         return results
     
     def _openai_moderation(self, content: str) -> Dict[str, Any]:
-        """Use OpenAI's moderation API"""
+        """Use OpenAI's moderation API, reusing results for content seen before"""
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        with _moderation_cache_lock:
+            cached = _moderation_cache.get(digest)
+            if cached is not None:
+                _moderation_cache.move_to_end(digest)
+        if cached is not None:
+            return {"safe": cached["safe"], "issues": list(cached["issues"])}
+        
+        # The request runs outside the lock so lookups never wait on the network
+        result = self._request_openai_moderation(content)
+        if result is not None:
+            with _moderation_cache_lock:
+                _moderation_cache[digest] = result
+                _moderation_cache.move_to_end(digest)
+                if len(_moderation_cache) > MODERATION_CACHE_SIZE:
+                    _moderation_cache.popitem(last=False)
+            return {"safe": result["safe"], "issues": list(result["issues"])}
+        return {"safe": True, "issues": []}  # Fail open for availability
+    
+    def _request_openai_moderation(self, content: str) -> Optional[Dict[str, Any]]:
+        """Call the moderation endpoint; None if the request failed"""
         try:
             response = self.openai_client.moderations.create(input=content)
             
@@ -89,23 +166,26 @@ class SafetyService:
         
         except Exception as e:
             logger.error(f"OpenAI moderation error: {e}")
-            return {"safe": True, "issues": []}  # Fail open for availability
+            return None  # Not cached, so the next call retries
     
     def _pattern_moderation(self, content: str, title: str) -> Dict[str, Any]:
         """Custom pattern-based moderation"""
         issues = []
-        full_text = f"{title} {content}".lower()
-        
-        for pattern in self.blocked_patterns:
-            if re.search(pattern, full_text, re.IGNORECASE):
-                issues.append(f"Potentially problematic content detected: {pattern}")
+        # Title and content are scanned in place instead of joined into a copy
+        matched = {
+            int(match.lastgroup[1:])
+            for text in (title, content)
+            for match in self._blocked_regex.finditer(text)
+        }
+        for i in sorted(matched):
+            issues.append(f"Potentially problematic content detected: {self.blocked_patterns[i]}")
         
         # Check for excessive capitalization (shouting)
-        if len(re.findall(r'[A-Z]{5,}', content)) > 3:
+        if _more_matches_than(_CAPS_PATTERN, content, 3):
             issues.append("Excessive capitalization detected")
         
         # Check for spam patterns
-        if len(re.findall(r'(click here|buy now|limited time)', content, re.IGNORECASE)) > 2:
+        if _more_matches_than(_SPAM_PATTERN, content, 2):
             issues.append("Potential spam patterns detected")
         
         return {"safe": len(issues) == 0, "issues": issues}
@@ -116,7 +196,8 @@ class SafetyService:
         recommendations = []
         
         # Length checks
-        word_count = len(content.split())
+        words = content.split()
+        word_count = len(words)
         if word_count < 300:
             warnings.append("Article is quite short (under 300 words)")
             recommendations.append("Consider expanding the content for better engagement")
@@ -132,9 +213,15 @@ class SafetyService:
             warnings.append("Title is quite short (under 30 characters)")
             recommendations.append("Consider making the title more descriptive")
         
-        # Readability checks
-        sentences = content.split('.')
-        avg_sentence_length = sum(len(s.split()) for s in sentences) / len(sentences) if sentences else 0
+        # Readability checks: words per '.'-separated sentence, reusing the
+        # word split above; only words with an inner '.' (e.g. "e.g", URLs)
+        # count as more than one sentence word
+        sentence_count = content.count('.') + 1
+        sentence_words = word_count
+        for word in words:
+            if '.' in word:
+                sentence_words += sum(1 for piece in word.split('.') if piece) - 1
+        avg_sentence_length = sentence_words / sentence_count
         
         if avg_sentence_length > 25:
             warnings.append("Average sentence length is high")
@@ -156,17 +243,11 @@ class SafetyService:
         """Basic plagiarism detection using text patterns"""
         warnings = []
         
-        # Check for common copied phrases (this is very basic)
-        common_phrases = [
-            "according to wikipedia",
-            "as stated in the documentation",
-            "copy and paste",
-            "lorem ipsum"
-        ]
-        
-        content_lower = content.lower()
-        for phrase in common_phrases:
-            if phrase in content_lower:
+        # Check for common copied phrases (this is very basic); one scan
+        # finds all of them without lowercasing a copy of the content
+        found = {match.group(0).lower() for match in _COPIED_PHRASE_PATTERN.finditer(content)}
+        for phrase in COMMON_COPIED_PHRASES:
+            if phrase in found:
                 warnings.append(f"Potentially copied phrase detected: '{phrase}'")
         
         # Check for unusual quotation patterns
@@ -261,14 +342,12 @@ class ContentValidator:
             issues.append("Multiple H1 tags found - should only have one")
         
         # Check for alt text in images
-        img_tags = re.findall(r'<img[^>]*>', content)
-        for img in img_tags:
+        for img in _IMG_TAG_PATTERN.findall(content):
             if 'alt=' not in img:
                 recommendations.append("Add alt text to images for accessibility")
         
         # Check for proper link structure
-        link_tags = re.findall(r'<a[^>]*>', content)
-        for link in link_tags:
+        for link in _LINK_TAG_PATTERN.findall(content):
             if 'href=' not in link:
                 issues.append("Link tag without href attribute found")
         
@@ -316,6 +395,8 @@ class MonitoringService:
     
     def __init__(self):
         self.metrics = {}
+        self._openai_client = None
+        self._health_cache = None  # (monotonic timestamp, health dict)
     
     def record_generation_metrics(self, step: str, duration: float, 
                                  tokens_used: int, cost: float) -> None:
@@ -352,7 +433,18 @@ class MonitoringService:
         return summary
     
     def check_system_health(self) -> Dict[str, Any]:
-        """Check overall system health"""
+        """Check overall system health, reusing the last result for HEALTH_CACHE_TTL_SECONDS"""
+        if self._health_cache is not None:
+            checked_at, cached = self._health_cache
+            if time.monotonic() - checked_at < HEALTH_CACHE_TTL_SECONDS:
+                return {"status": cached["status"], "checks": dict(cached["checks"])}
+        
+        health = self._run_health_checks()
+        self._health_cache = (time.monotonic(), health)
+        return {"status": health["status"], "checks": dict(health["checks"])}
+    
+    def _run_health_checks(self) -> Dict[str, Any]:
+        """Probe the database, OpenAI and Medium"""
         health = {
             "status": "healthy",
             "checks": {}
@@ -360,9 +452,9 @@ class MonitoringService:
         
         # Check database connection
         try:
-            from db.database import SessionLocal
+            from db.database import SessionLocal, PING_QUERY
             db = SessionLocal()
-            db.execute("SELECT 1")
+            db.execute(PING_QUERY)
             db.close()
             health["checks"]["database"] = "ok"
         except Exception as e:
@@ -371,8 +463,10 @@ class MonitoringService:
         
         # Check OpenAI API
         try:
-            client = OpenAI(api_key=settings.openai_api_key)
-            client.models.list()
+            if self._openai_client is None:
+                self._openai_client = OpenAI(api_key=settings.openai_api_key)
+            # A single-model lookup is a much smaller response than models.list()
+            self._openai_client.models.retrieve(HEALTH_CHECK_MODEL)
             health["checks"]["openai"] = "ok"
         except Exception as e:
             health["checks"]["openai"] = f"error: {str(e)}"
@@ -1,6 +1,7 @@
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, Any, List, Optional, Set, Tuple
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
@@ -9,20 +10,55 @@ from services.gmail import GmailService
 from services.email_processor import EmailProcessor
 from services.tasks import GoogleTasksService
 from services.safety import MonitoringService
-from db.models import Email, Task, DailySummary, ProcessingLog
-from db.database import SessionLocal
+from db.models import Email, EmailStatus, Task, DailySummary, ProcessingLog
+from db.database import SessionLocal, session_scope
 import asyncio
+from sqlalchemy import exists, insert
+from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
 
+JOB_DEFAULTS = {
+    'coalesce': True,
+    'max_instances': 1,
+    'misfire_grace_time': 300
+}
+
+# Error logs are queued and written in batches by one background task
+LOG_QUEUE_SIZE = 1024
+LOG_FLUSH_SIZE = 100
+LOG_FLUSH_INTERVAL_SECONDS = 5
+
+# Email batches buffered between the fetch, save and AI pipeline stages
+PIPELINE_QUEUE_SIZE = 4
+
+# Core INSERT reused for every summary; SQLAlchemy caches its compiled form
+_DAILY_SUMMARY_INSERT = insert(DailySummary)
+
+
+@lru_cache(maxsize=2)
+def _day_window(day: date) -> Tuple[datetime, datetime]:
+    """Half-open [midnight, next midnight) range covering day"""
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
 
 class EmailProcessingScheduler:
     def __init__(self):
-        self.scheduler = AsyncIOScheduler()
+        # Collapse missed runs into one and never overlap a job with itself,
+        # so a slow run cannot make the next ones queue up behind it
+        self.scheduler = AsyncIOScheduler(job_defaults=JOB_DEFAULTS)
         self.gmail_service = GmailService()
         self.email_processor = EmailProcessor()
         self.tasks_service = GoogleTasksService()
         self.monitoring_service = MonitoringService()
+        self._log_queue: asyncio.Queue = asyncio.Queue(maxsize=LOG_QUEUE_SIZE)
+        self._log_batch: List[Dict[str, Any]] = []
+        self._log_flusher: Optional[asyncio.Task] = None
+        # Manually triggered runs still in progress, by job ID
+        self._manual_tasks: Dict[str, asyncio.Task] = {}
+        # Called after a job commits emails, tasks or summaries (e.g. to drop cached stats)
+        self.on_data_changed: Optional[Callable[[], None]] = None
         
     def start(self):
         """Start the scheduler"""
@@ -59,7 +95,7 @@ class EmailProcessingScheduler:
         # Cleanup old data weekly
         self.scheduler.add_job(
             self.cleanup_old_data,
-            CronTrigger(day_of_week=0, hour=2, minute=0),  # Sunday 2 AM
+            CronTrigger(day_of_week='sun', hour=2, minute=0),  # Sunday 2 AM
             id='cleanup_old_data',
             name='Cleanup Old Data',
             replace_existing=True
@@ -75,53 +111,81 @@ class EmailProcessingScheduler:
         )
         
         self.scheduler.start()
+        self._log_flusher = asyncio.get_running_loop().create_task(self._flush_error_logs())
         logger.info("Email processing scheduler started")
     
     def stop(self):
         """Stop the scheduler"""
         self.scheduler.shutdown()
+        for task in self._manual_tasks.values():
+            task.cancel()
+        if self._log_flusher is not None:
+            self._log_flusher.cancel()
+            self._log_flusher = None
+        # Write whatever the flusher had not reached yet
+        while not self._log_queue.empty():
+            self._log_batch.append(self._log_queue.get_nowait())
+        if self._log_batch:
+            batch, self._log_batch = self._log_batch, []
+            self._write_error_logs(batch)
         logger.info("Email processing scheduler stopped")
     
     async def daily_email_processing(self):
         """Main daily email processing workflow"""
         logger.info("Starting daily email processing workflow")
         
+        # One session for the workflow's own bookkeeping queries and writes
+        try:
+            with session_scope() as db:
+                await self._run_daily_email_processing(db)
+        finally:
+            # The summary row is committed when the session scope closes
+            self._notify_data_changed()
+    
+    async def _run_daily_email_processing(self, db: Session):
+        """Workflow steps for daily_email_processing, using db for bookkeeping"""
         try:
             # Check if we've already processed today
             today = datetime.now().date()
-            if self._already_processed_today(today):
+            if await asyncio.to_thread(self._already_processed_today, today, db=db):
                 logger.info("Email processing already completed for today")
                 return
             
-            # Step 1: Fetch new emails from Gmail
-            logger.info("Step 1: Fetching emails from Gmail")
-            emails = self.gmail_service.get_recent_emails(
-                max_results=settings.gmail_max_emails,
-                hours_back=24
-            )
+            # Emails left unprocessed by earlier runs, read before the pipeline
+            # so emails that fail in it are not retried by this run
+            backlog_ids = await asyncio.to_thread(self._unprocessed_email_ids, db=db)
             
-            if not emails:
-                logger.info("No new emails found")
-                return
+            # End the read transaction so no connection is held while the
+            # Gmail and OpenAI steps run
+            await asyncio.to_thread(db.commit)
             
-            logger.info(f"Found {len(emails)} emails to process")
+            # Steps 1-3: Fetch new emails from Gmail, save them and process
+            # them with AI, as a pipeline over Gmail batches
+            logger.info("Steps 1-3: Fetching, saving and processing emails")
+            fetched, processing_results, pipeline_ids = await self._run_email_pipeline()
             
-            # Step 2: Save emails to database
-            email_ids = self.gmail_service.save_emails_to_db(emails)
+            backlog_ids = [email_id for email_id in backlog_ids if email_id not in pipeline_ids]
+            if not fetched and not backlog_ids:
+                logger.info("No new emails found")
+                return
             
-            # Step 3: Process emails with AI
-            logger.info("Step 3: Processing emails with AI")
-            processing_results = self.email_processor.process_unprocessed_emails()
+            if backlog_ids:
+                self._add_processing_results(
+                    processing_results,
+                    await self.email_processor.process_unprocessed_emails(backlog_ids)
+                )
+                self._notify_data_changed()
             
             # Step 4: Generate daily summary
             logger.info("Step 4: Generating daily summary")
-            summary_data = self.email_processor.generate_daily_summary()
-            
-            # Step 5: Save daily summary to database
-            self._save_daily_summary(summary_data, processing_results)
+            summary_data = await asyncio.to_thread(self.email_processor.generate_daily_summary)
             
-            # Step 6: Send notification (if configured)
-            await self._send_daily_notification(summary_data, processing_results)
+            # Steps 5-6: Save daily summary to database and send notification
+            # (if configured); independent, so they run concurrently
+            await asyncio.gather(
+                asyncio.to_thread(self._save_daily_summary, summary_data, processing_results, db=db),
+                self._send_daily_notification(summary_data, processing_results)
+            )
             
             logger.info(f"Daily email processing completed successfully.")
             logger.info(f"Processed: {processing_results['processed']} emails")
@@ -130,15 +194,102 @@ class EmailProcessingScheduler:
             
         except Exception as e:
             logger.error(f"Error in daily email processing: {e}")
-            self._log_error("daily_email_processing", str(e))
+            self._log_error("daily_email_processing", str(e), db=db)
+    
+    async def _run_email_pipeline(self) -> Tuple[int, Dict[str, Any], Set[int]]:
+        """
+        Stream new emails through fetch -> save -> AI stages
+        
+        Each Gmail batch is saved and handed to the AI stage as soon as it
+        arrives, so downloading, saving and OpenAI calls overlap instead of
+        running one after another.
+        
+        Returns:
+            Number of emails fetched, the AI processing results, and the IDs
+            of the emails handed to the AI stage
+        """
+        fetch_queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        process_queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        fetched = 0
+        pipeline_ids: Set[int] = set()
+        processing_results = {'processed': 0, 'errors': 0, 'total_cost': 0.0,
+                              'total_tokens': 0, 'tasks_created': 0}
+        
+        # Blocking Gmail/DB client calls run in worker threads (the AI stage
+        # offloads its own session and Google Tasks work) so the scheduler's
+        # other jobs keep running during the workflow
+        async def fetch_stage():
+            nonlocal fetched
+            batches = self.gmail_service.iter_recent_email_batches(
+                max_results=settings.gmail_max_emails,
+                hours_back=24,
+                skip_stored=True
+            )
+            while True:
+                emails = await asyncio.to_thread(next, batches, None)
+                if emails is None:
+                    break
+                fetched += len(emails)
+                await fetch_queue.put(emails)
+            await fetch_queue.put(None)  # No more batches
+        
+        async def save_stage():
+            while True:
+                emails = await fetch_queue.get()
+                if emails is None:
+                    break
+                email_ids = await asyncio.to_thread(self.gmail_service.save_emails_to_db, emails)
+                if email_ids:
+                    self._notify_data_changed()
+                await process_queue.put(email_ids)
+            await process_queue.put(None)
+        
+        async def process_stage():
+            while True:
+                email_ids = await process_queue.get()
+                if email_ids is None:
+                    break
+                pipeline_ids.update(email_ids)
+                self._add_processing_results(
+                    processing_results,
+                    await self.email_processor.process_unprocessed_emails(email_ids)
+                )
+                self._notify_data_changed()
+        
+        stages = [asyncio.create_task(stage()) for stage in (fetch_stage, save_stage, process_stage)]
+        try:
+            await asyncio.gather(*stages)
+        except Exception:
+            # A failed stage would leave the others waiting on its queue
+            for stage in stages:
+                stage.cancel()
+            raise
+        
+        if fetched:
+            logger.info(f"Fetched {fetched} emails")
+        return fetched, processing_results, pipeline_ids
+    
+    def _notify_data_changed(self):
+        """Run the on_data_changed hook, if one is set"""
+        if self.on_data_changed is not None:
+            self.on_data_changed()
+    
+    @staticmethod
+    def _add_processing_results(totals: Dict[str, Any], results: Dict[str, Any]):
+        """Add one process_unprocessed_emails() result into running totals"""
+        for key in totals:
+            totals[key] += results.get(key, 0)
     
     async def sync_google_tasks(self):
         """Sync local tasks with Google Tasks"""
         logger.info("Syncing with Google Tasks")
         
         try:
-            stats = self.tasks_service.sync_with_google_tasks()
+            # The Tasks client and its retry backoff are blocking; run them off
+            # the event loop so other scheduled jobs keep running
+            stats = await asyncio.to_thread(self.tasks_service.sync_with_google_tasks)
             logger.info(f"Google Tasks sync completed: {stats}")
+            self._notify_data_changed()
             
         except Exception as e:
             logger.error(f"Error syncing with Google Tasks: {e}")
@@ -152,22 +303,15 @@ class EmailProcessingScheduler:
             summary_data = self.email_processor.generate_daily_summary()
             
             # Save to database if not already saved
-            db = SessionLocal()
-            try:
-                today = datetime.now().date()
-                existing = db.query(DailySummary).filter(
-                    DailySummary.date >= today,
-                    DailySummary.date < today + timedelta(days=1)
-                ).first()
-                
-                if not existing:
-                    self._save_daily_summary(summary_data, {})
+            with session_scope() as db:
+                saved = not self._already_processed_today(datetime.now().date(), db=db)
+                if saved:
+                    self._save_daily_summary(summary_data, {}, db=db)
                     logger.info("Daily summary generated and saved")
                 else:
                     logger.info("Daily summary already exists for today")
-                    
-            finally:
-                db.close()
+            if saved:
+                self._notify_data_changed()
                 
         except Exception as e:
             logger.error(f"Error generating daily summary: {e}")
@@ -190,22 +334,26 @@ class EmailProcessingScheduler:
         db = SessionLocal()
         try:
             # Delete old emails (older than 90 days)
+            # Single DELETEs: rowcount replaces a separate COUNT scan, and no
+            # loaded objects need to be synchronized
             cutoff_date = datetime.utcnow() - timedelta(days=90)
-            old_emails = db.query(Email).filter(Email.created_at < cutoff_date).count()
-            
-            if old_emails > 0:
-                db.query(Email).filter(Email.created_at < cutoff_date).delete()
+            old_emails = db.query(Email).filter(
+                Email.created_at < cutoff_date
+            ).delete(synchronize_session=False)
+            if old_emails:
                 logger.info(f"Deleted {old_emails} old emails")
             
             # Delete old processing logs (older than 30 days)
             log_cutoff = datetime.utcnow() - timedelta(days=30)
-            old_logs = db.query(ProcessingLog).filter(ProcessingLog.created_at < log_cutoff).count()
-            
-            if old_logs > 0:
-                db.query(ProcessingLog).filter(ProcessingLog.created_at < log_cutoff).delete()
+            old_logs = db.query(ProcessingLog).filter(
+                ProcessingLog.created_at < log_cutoff
+            ).delete(synchronize_session=False)
+            if old_logs:
                 logger.info(f"Deleted {old_logs} old processing logs")
             
             db.commit()
+            if old_emails:
+                self._notify_data_changed()
             
         except Exception as e:
             db.rollback()
@@ -219,59 +367,83 @@ class EmailProcessingScheduler:
         
         job_id = f"manual_processing_{datetime.now().timestamp()}"
         
-        self.scheduler.add_job(
-            self.daily_email_processing,
-            'date',
-            run_date=datetime.now() + timedelta(seconds=5),
-            id=job_id
-        )
+        # Start right away on the running event loop instead of scheduling a
+        # one-off APScheduler job a few seconds out
+        task = asyncio.get_running_loop().create_task(self.daily_email_processing(), name=job_id)
+        self._manual_tasks[job_id] = task
+        task.add_done_callback(lambda _: self._manual_tasks.pop(job_id, None))
         
         return job_id
     
-    def _already_processed_today(self, date: datetime.date) -> bool:
+    def _unprocessed_email_ids(self, db: Optional[Session] = None) -> List[int]:
+        """IDs of stored emails still waiting for AI processing"""
+        own_session = db is None
+        if own_session:
+            db = SessionLocal()
+        try:
+            return [row.id for row in db.query(Email.id).filter(
+                Email.status == EmailStatus.UNPROCESSED
+            )]
+        finally:
+            if own_session:
+                db.close()
+    
+    def _already_processed_today(self, day: date, db: Optional[Session] = None) -> bool:
         """Check if we've already processed emails today"""
-        db = SessionLocal()
+        own_session = db is None
+        if own_session:
+            db = SessionLocal()
         try:
-            start_date = datetime.combine(date, datetime.min.time())
-            end_date = start_date + timedelta(days=1)
+            start_date, end_date = _day_window(day)
             
-            summary = db.query(DailySummary).filter(
+            # EXISTS probe on ix_daily_summaries_date; no row is fetched
+            return db.query(exists().where(
                 DailySummary.date >= start_date,
                 DailySummary.date < end_date
-            ).first()
-            
-            return summary is not None
+            )).scalar()
             
         finally:
-            db.close()
+            if own_session:
+                db.close()
     
-    def _save_daily_summary(self, summary_data: Dict[str, Any], processing_results: Dict[str, Any]):
-        """Save daily summary to database"""
-        db = SessionLocal()
+    def _save_daily_summary(self, summary_data: Dict[str, Any], processing_results: Dict[str, Any],
+                            db: Optional[Session] = None):
+        """
+        Save daily summary to database
+        
+        When db is given the row is added to the caller's transaction, which
+        the caller commits or rolls back; errors are raised to it.
+        """
+        own_session = db is None
+        if own_session:
+            db = SessionLocal()
         try:
-            summary = DailySummary(
-                date=datetime.now(),
-                total_emails_processed=processing_results.get('processed', 0),
-                important_emails_count=0,  # Will be calculated
-                tasks_extracted=processing_results.get('tasks_created', 0),
-                high_priority_tasks=0,  # Will be calculated
-                summary_text=summary_data.get('summary', ''),
-                top_senders=[],  # Will be populated later
-                key_topics=[],  # Will be populated later
-                processing_time_seconds=0,  # Will be calculated
-                total_tokens_used=processing_results.get('total_tokens', 0),
-                total_cost=processing_results.get('total_cost', 0.0)
-            )
-            
-            db.add(summary)
-            db.commit()
+            # Nothing reads the row back, so skip the ORM unit of work
+            db.execute(_DAILY_SUMMARY_INSERT, {
+                "date": datetime.now(),
+                "total_emails_processed": processing_results.get('processed', 0),
+                "important_emails_count": 0,  # Will be calculated
+                "tasks_extracted": processing_results.get('tasks_created', 0),
+                "high_priority_tasks": 0,  # Will be calculated
+                "summary_text": summary_data.get('summary', ''),
+                "top_senders": [],  # Will be populated later
+                "key_topics": [],  # Will be populated later
+                "processing_time_seconds": 0,  # Will be calculated
+                "total_tokens_used": processing_results.get('total_tokens', 0),
+                "total_cost": processing_results.get('total_cost', 0.0)
+            })
+            if own_session:
+                db.commit()
             logger.info("Daily summary saved to database")
             
         except Exception as e:
+            if not own_session:
+                raise
             db.rollback()
             logger.error(f"Error saving daily summary: {e}")
         finally:
-            db.close()
+            if own_session:
+                db.close()
     
     async def _send_daily_notification(self, summary_data: Dict[str, Any], processing_results: Dict[str, Any]):
         """Send daily processing notification"""
@@ -293,19 +465,56 @@ class EmailProcessingScheduler:
         
         logger.info(f"Daily notification: {notification_text}")
     
-    def _log_error(self, operation: str, error_message: str):
-        """Log error to database"""
-        db = SessionLocal()
+    def _log_error(self, operation: str, error_message: str, db: Optional[Session] = None):
+        """Queue an error log for the background flusher"""
+        if db is not None:
+            db.rollback()  # Discard whatever the failed step left pending
+        
+        # Plain row dict; the flusher inserts queued rows with one executemany
+        log = {
+            "operation": operation,
+            "status": "error",
+            "message": error_message,
+            "details": {"timestamp": datetime.utcnow().isoformat()}
+        }
+        
+        if self._log_flusher is None:
+            # Scheduler not running (e.g. a manual sync): nothing will drain the queue
+            self._write_error_logs([log])
+            return
+        
         try:
-            log = ProcessingLog(
-                operation=operation,
-                status="error",
-                message=error_message,
-                details={"timestamp": datetime.utcnow().isoformat()}
-            )
-            db.add(log)
-            db.commit()
+            self._log_queue.put_nowait(log)
+        except asyncio.QueueFull:
+            logger.error(f"Error log queue full, dropping log for {operation}: {error_message}")
+    
+    async def _flush_error_logs(self):
+        """Drain queued error logs in batches of up to LOG_FLUSH_SIZE"""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            self._log_batch.append(await self._log_queue.get())
+            deadline = loop.time() + LOG_FLUSH_INTERVAL_SECONDS
+            
+            # Keep collecting until the batch is full or the interval elapses
+            while len(self._log_batch) < LOG_FLUSH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._log_batch.append(
+                        await asyncio.wait_for(self._log_queue.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+            
+            batch, self._log_batch = self._log_batch, []
+            await asyncio.to_thread(self._write_error_logs, batch)
+    
+    def _write_error_logs(self, logs: List[Dict[str, Any]]):
+        """Insert error log rows with one Core executemany, bypassing the ORM flush"""
+        try:
+            with session_scope() as db:
+                db.execute(insert(ProcessingLog), logs)
         except Exception as e:
-            logger.error(f"Failed to log error: {e}")
-        finally:
-            db.close()
\ No newline at end of file
+            logger.error(f"Failed to log {len(logs)} error(s): {e}")
@@ -1,23 +1,38 @@
+import json
 import os
+import random
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
+from typing import List, Dict, Any, Optional, Tuple
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from sqlalchemy.orm import Session
 import logging
 from config import settings
 from db.models import Task, TaskStatus
 from db.database import SessionLocal
+from services.gmail import SCOPES, load_valid_credentials, save_credentials
 
 logger = logging.getLogger(__name__)
 
-# Gmail and Tasks API scopes (shared with Gmail service)
-SCOPES = [
-    'https://www.googleapis.com/auth/gmail.readonly',
-    'https://www.googleapis.com/auth/tasks'
-]
+# Task inserts per HTTP batch request
+TASKS_BATCH_SIZE = 50
+# Tasks per tasks.list page (the API maximum)
+TASKS_PAGE_SIZE = 100
+# Task IDs per bulk UPDATE ... WHERE id IN (...) (stays under SQLite's parameter limit)
+UPDATE_CHUNK_SIZE = 500
+# Resolved task list ID, cached next to the token file
+TASK_LIST_CACHE_SUFFIX = ".tasklist.json"
+# Time of the last complete sync, stored next to the token file
+SYNC_STATE_SUFFIX = ".tasksync.json"
+# Re-read changes this far before the last sync to allow for clock skew
+SYNC_OVERLAP = timedelta(minutes=5)
+
+
+def _retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter, so concurrent retries do not fire in lockstep"""
+    return 2 ** attempt + random.uniform(0, 0.5)
 
 
 class GoogleTasksService:
@@ -30,42 +45,106 @@ class GoogleTasksService:
     
     def _authenticate(self):
         """Authenticate with Google Tasks API"""
-        creds = None
-        
-        # Check if token file exists
-        if os.path.exists(settings.google_token_file):
-            creds = Credentials.from_authorized_user_file(settings.google_token_file, SCOPES)
+        # Token shared with the Gmail service, refreshed if expired
+        creds = load_valid_credentials(settings.google_token_file, SCOPES)
         
         # If no valid credentials, go through OAuth flow
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                try:
-                    creds.refresh(Request())
-                except Exception as e:
-                    logger.error(f"Failed to refresh credentials: {e}")
-                    creds = None
-            
-            if not creds:
-                if not os.path.exists(settings.google_credentials_file):
-                    raise FileNotFoundError(
-                        f"Google credentials file not found: {settings.google_credentials_file}"
-                    )
-                
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    settings.google_credentials_file, SCOPES
+        if not creds:
+            if not os.path.exists(settings.google_credentials_file):
+                raise FileNotFoundError(
+                    f"Google credentials file not found: {settings.google_credentials_file}"
                 )
-                creds = flow.run_local_server(port=0)
+            
+            flow = InstalledAppFlow.from_client_secrets_file(
+                settings.google_credentials_file, SCOPES
+            )
+            creds = flow.run_local_server(port=0)
             
             # Save credentials for next run
-            with open(settings.google_token_file, 'w') as token:
-                token.write(creds.to_json())
+            save_credentials(settings.google_token_file, SCOPES, creds)
         
         self.credentials = creds
         self.service = build('tasks', 'v1', credentials=creds)
         logger.info("✅ Google Tasks API authentication successful")
     
-    def _get_default_task_list(self):
-        """Get or create default task list"""
+    def _task_list_cache_file(self) -> str:
+        return settings.google_token_file + TASK_LIST_CACHE_SUFFIX
+    
+    def _load_cached_task_list_id(self) -> Optional[str]:
+        """Task list ID resolved by an earlier run for the configured list name"""
+        try:
+            with open(self._task_list_cache_file()) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get('name') != settings.default_task_list_name:
+            return None
+        return cached.get('task_list_id')
+    
+    def _save_task_list_id(self):
+        try:
+            with open(self._task_list_cache_file(), 'w') as f:
+                json.dump({
+                    'task_list_id': self.default_task_list_id,
+                    'name': settings.default_task_list_name
+                }, f)
+        except OSError as e:
+            logger.warning(f"Could not cache task list ID: {e}")
+    
+    def _sync_state_file(self) -> str:
+        return settings.google_token_file + SYNC_STATE_SUFFIX
+    
+    def _load_last_sync(self) -> Optional[str]:
+        """RFC 3339 updatedMin for an incremental sync of the current list; None for a full sync"""
+        try:
+            with open(self._sync_state_file()) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get('task_list_id') != self.default_task_list_id:
+            return None
+        return state.get('updated_min')
+    
+    def _save_last_sync(self, synced_at: datetime):
+        try:
+            with open(self._sync_state_file(), 'w') as f:
+                json.dump({
+                    'task_list_id': self.default_task_list_id,
+                    'updated_min': (synced_at - SYNC_OVERLAP).isoformat(timespec='seconds') + 'Z'
+                }, f)
+        except OSError as e:
+            logger.warning(f"Could not save task sync state: {e}")
+    
+    def _reset_connections(self, error: Exception):
+        """
+        After a socket-level failure, drop the client's pooled connections so
+        the retry reconnects; credentials and the built service are kept
+        (the authorized transport already refreshes the token on a 401)
+        """
+        if isinstance(error, OSError):  # e.g. EADDRNOTAVAIL, connection reset, DNS failure
+            self.service.close()
+    
+    def _handle_missing_task_list(self, error: Exception) -> bool:
+        """On a 404 (cached list deleted), drop the cache and resolve the list again"""
+        if not (isinstance(error, HttpError) and error.resp.status == 404):
+            return False
+        logger.warning("Task list not found; resolving it again")
+        try:
+            os.remove(self._task_list_cache_file())
+        except OSError:
+            pass
+        self._get_default_task_list(use_cache=False)
+        return True
+    
+    def _get_default_task_list(self, use_cache: bool = True):
+        """Get or create default task list, reusing the ID cached by an earlier run"""
+        if use_cache:
+            cached_id = self._load_cached_task_list_id()
+            if cached_id:
+                self.default_task_list_id = cached_id
+                logger.info(f"Using cached task list: {settings.default_task_list_name}")
+                return
+        
         try:
             # Get all task lists
             task_lists = self.service.tasklists().list().execute()
@@ -75,6 +154,7 @@ class GoogleTasksService:
                 if task_list['title'] == settings.default_task_list_name:
                     self.default_task_list_id = task_list['id']
                     logger.info(f"Using existing task list: {settings.default_task_list_name}")
+                    self._save_task_list_id()
                     return
             
             # Use the first list if our named list doesn't exist
@@ -89,6 +169,7 @@ class GoogleTasksService:
                 result = self.service.tasklists().insert(body=new_list).execute()
                 self.default_task_list_id = result['id']
                 logger.info(f"Created new task list: {settings.default_task_list_name}")
+            self._save_task_list_id()
                 
         except Exception as e:
             logger.error(f"Error getting task list: {e}")
@@ -109,16 +190,7 @@ class GoogleTasksService:
         Returns:
             Google Task ID if successful, None otherwise
         """
-        task_body = {
-            'title': title
-        }
-        
-        if description:
-            task_body['notes'] = description
-        
-        if due_date:
-            # Google Tasks expects RFC 3339 format
-            task_body['due'] = due_date.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+        task_body = self._task_body(title, description, due_date)
         
         # Create the task with retry logic
         retries = 3
@@ -134,19 +206,83 @@ class GoogleTasksService:
                 return google_task_id
                 
             except Exception as e:
+                if attempt < retries - 1 and self._handle_missing_task_list(e):
+                    continue  # Retry against the re-resolved list
                 if attempt < retries - 1:
-                    logger.warning(f"Create task attempt {attempt + 1} failed: {e}. Retrying in {2 ** attempt} seconds...")
-                    import time
-                    time.sleep(2 ** attempt)
-                    # Re-authenticate if connection error
-                    if "Can't assign requested address" in str(e):
-                        self._authenticate()
+                    delay = _retry_delay(attempt)
+                    logger.warning(f"Create task attempt {attempt + 1} failed: {e}. Retrying in {delay:.1f} seconds...")
+                    time.sleep(delay)
+                    self._reset_connections(e)
                 else:
                     logger.error(f"Error creating task after {retries} attempts: {e}")
                     return None
         
         return None  # Should not reach here
     
+    def _task_body(self, title: str, description: str = "",
+                   due_date: Optional[datetime] = None) -> Dict[str, Any]:
+        """Build a Google Tasks insert body"""
+        task_body = {
+            'title': title
+        }
+        
+        if description:
+            task_body['notes'] = description
+        
+        if due_date:
+            # Google Tasks expects RFC 3339 format
+            task_body['due'] = due_date.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+        
+        return task_body
+    
+    def create_tasks_bulk(self, tasks: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """
+        Create many tasks in Google Tasks, TASKS_BATCH_SIZE per HTTP batch request
+        
+        Args:
+            tasks: Dictionaries with title and optional description/due_date
+        
+        Returns:
+            Google Task IDs in the same order as tasks, None where creation failed
+        """
+        results: List[Optional[str]] = [None] * len(tasks)
+        errors = []
+        
+        def collect(request_id, response, exception):
+            # Callbacks run sequentially inside batch.execute()
+            if exception is not None:
+                logger.error(f"Error creating task {tasks[int(request_id)]['title']}: {exception}")
+                errors.append(exception)
+                return
+            results[int(request_id)] = response['id']
+        
+        for start in range(0, len(tasks), TASKS_BATCH_SIZE):
+            batch = self.service.new_batch_http_request(callback=collect)
+            for i in range(start, min(start + TASKS_BATCH_SIZE, len(tasks))):
+                task = tasks[i]
+                batch.add(
+                    self.service.tasks().insert(
+                        tasklist=self.default_task_list_id,
+                        body=self._task_body(
+                            task['title'], task.get('description', ''), task.get('due_date')
+                        )
+                    ),
+                    request_id=str(i)
+                )
+            try:
+                batch.execute()
+            except Exception as e:
+                logger.error(f"Error creating task batch: {e}")
+        
+        # A stale cached list fails every insert with 404; re-resolve it for later calls
+        for error in errors:
+            if self._handle_missing_task_list(error):
+                break
+        
+        created = sum(1 for google_task_id in results if google_task_id)
+        logger.info(f"Created {created}/{len(tasks)} Google Tasks")
+        return results
+    
     def update_task(self, google_task_id: str, title: str = None, 
                    description: str = None, completed: bool = None) -> bool:
         """Update an existing task"""
@@ -197,36 +333,79 @@ class GoogleTasksService:
             logger.error(f"Error deleting task: {e}")
             return False
     
-    def get_tasks(self, completed: bool = False) -> List[Dict[str, Any]]:
-        """Get tasks from Google Tasks"""
+    def get_tasks(self, completed: bool = False, fields: Optional[str] = None,
+                  updated_min: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get tasks from Google Tasks, following every result page
+        
+        Args:
+            completed: Include completed tasks
+            fields: Task fields to return (e.g. "id,status"); all fields if None
+            updated_min: Only tasks updated at or after this RFC 3339 time
+        """
+        return self._fetch_tasks(completed, fields, updated_min)[0]
+    
+    def _fetch_tasks(self, completed: bool, fields: Optional[str],
+                     updated_min: Optional[str]) -> Tuple[List[Dict[str, Any]], bool]:
+        """Tasks from every result page, and whether every page was fetched"""
+        items = []
+        page_token = None
+        while True:
+            page = self._list_tasks_page(completed, page_token, fields, updated_min)
+            if page is None:
+                return items, False  # Pages fetched before the failure
+            items.extend(page.get('items', []))
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                return items, True
+    
+    def _list_tasks_page(self, completed: bool, page_token: Optional[str],
+                         fields: Optional[str], updated_min: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Fetch one page of tasks with retries; None if every attempt failed"""
+        request_args = {
+            'tasklist': self.default_task_list_id,
+            'showCompleted': completed,
+            # Tasks completed in Google's own apps are hidden, not just completed
+            'showHidden': completed,
+            'showDeleted': False,
+            'maxResults': TASKS_PAGE_SIZE
+        }
+        if page_token:
+            request_args['pageToken'] = page_token
+        if fields:
+            request_args['fields'] = f"items({fields}),nextPageToken"
+        if updated_min:
+            request_args['updatedMin'] = updated_min
+        
         retries = 3
         for attempt in range(retries):
             try:
-                result = self.service.tasks().list(
-                    tasklist=self.default_task_list_id,
-                    showCompleted=completed,
-                    showDeleted=False
-                ).execute()
-                
-                return result.get('items', [])
+                request_args['tasklist'] = self.default_task_list_id
+                return self.service.tasks().list(**request_args).execute()
                 
             except Exception as e:
+                if attempt < retries - 1 and self._handle_missing_task_list(e):
+                    continue  # Retry against the re-resolved list
                 if attempt < retries - 1:
-                    logger.warning(f"Tasks API attempt {attempt + 1} failed: {e}. Retrying in {2 ** attempt} seconds...")
-                    import time
-                    time.sleep(2 ** attempt)
-                    # Re-authenticate if connection error
-                    if "Can't assign requested address" in str(e):
-                        self._authenticate()
+                    delay = _retry_delay(attempt)
+                    logger.warning(f"Tasks API attempt {attempt + 1} failed: {e}. Retrying in {delay:.1f} seconds...")
+                    time.sleep(delay)
+                    self._reset_connections(e)
                 else:
                     logger.error(f"Error getting tasks after {retries} attempts: {e}")
-                    return []
+                    return None
     
     def save_task_to_db(self, title: str, description: str = "", due_date: Optional[datetime] = None,
                        priority: str = "medium", email_id: Optional[int] = None,
-                       confidence_score: float = 0.0) -> Optional[int]:
-        """Save task to local database and sync with Google Tasks"""
-        db = SessionLocal()
+                       confidence_score: float = 0.0, db: Optional[Session] = None) -> Optional[int]:
+        """
+        Save task to local database and sync with Google Tasks
+        
+        When db is given the task is only flushed and the caller commits.
+        """
+        own_session = db is None
+        if own_session:
+            db = SessionLocal()
         
         try:
             # Create task in Google Tasks first
@@ -251,8 +430,11 @@ class GoogleTasksService:
             )
             
             db.add(task)
-            db.commit()
-            db.refresh(task)
+            if own_session:
+                db.commit()
+                db.refresh(task)
+            else:
+                db.flush()  # Assign the ID without committing the caller's batch
             
             logger.info(f"Saved task to database: {title}")
             return task.id
@@ -262,7 +444,82 @@ class GoogleTasksService:
             logger.error(f"Error saving task to database: {e}")
             return None
         finally:
-            db.close()
+            if own_session:
+                db.close()
+    
+    def save_tasks_bulk(self, tasks: List[Dict[str, Any]], email_id: Optional[int] = None,
+                        db: Optional[Session] = None) -> List[int]:
+        """
+        Create many tasks in Google Tasks with batched requests, then save them locally
+        
+        Args:
+            tasks: Dictionaries with title and optional description, due_date,
+                priority and confidence_score
+            email_id: Source email for every task
+            db: Shared session; when given the tasks are only flushed and the
+                caller commits
+        
+        Returns:
+            Local IDs of the tasks that were created in Google Tasks
+        """
+        if not tasks:
+            return []
+        return self.save_created_tasks(tasks, self.create_tasks_bulk(tasks), email_id, db)
+    
+    def save_created_tasks(self, tasks: List[Dict[str, Any]], google_task_ids: List[Optional[str]],
+                           email_id: Optional[int] = None, db: Optional[Session] = None) -> List[int]:
+        """
+        Save tasks already created by create_tasks_bulk() to the database
+        
+        Split from save_tasks_bulk() so async callers can run the HTTP and
+        database halves separately. Only tasks with a Google Task ID are saved.
+        """
+        if not tasks:
+            return []
+        
+        own_session = db is None
+        if own_session:
+            db = SessionLocal()
+        
+        try:
+            records = [
+                Task(
+                    email_id=email_id,
+                    title=task['title'],
+                    description=task.get('description', ''),
+                    due_date=task.get('due_date'),
+                    priority=task.get('priority', 'medium'),
+                    google_task_id=google_task_id,
+                    google_task_list_id=self.default_task_list_id,
+                    confidence_score=task.get('confidence_score', 0.0),
+                    extraction_method="ai",
+                    status=TaskStatus.PENDING
+                )
+                for task, google_task_id in zip(tasks, google_task_ids)
+                if google_task_id
+            ]
+            if not records:
+                logger.error("Failed to create tasks in Google Tasks")
+                return []
+            
+            db.add_all(records)
+            db.flush()  # Assign the IDs; a shared session is committed by the caller
+            task_ids = [record.id for record in records]
+            if own_session:
+                db.commit()
+            
+            logger.info(f"Saved {len(records)} tasks to database")
+            return task_ids
+            
+        except Exception as e:
+            if not own_session:
+                raise  # The caller's batch decides what to roll back
+            db.rollback()
+            logger.error(f"Error saving tasks to database: {e}")
+            return []
+        finally:
+            if own_session:
+                db.close()
     
     def complete_task(self, task_id: int) -> bool:
         """Mark task as completed both locally and in Google Tasks"""
@@ -327,38 +584,52 @@ class GoogleTasksService:
         stats = {'synced': 0, 'errors': 0}
         
         try:
-            # Get all local tasks that have Google Task IDs
-            local_tasks = db.query(Task).filter(
-                Task.google_task_id.isnot(None)
-            ).all()
-            
-            # Get all Google Tasks
-            google_tasks = self.get_tasks(completed=True)
+            # Only tasks changed since the last complete sync (all on the first run)
+            sync_started = datetime.utcnow()
+            updated_min = self._load_last_sync()
+            google_tasks, fetched_all = self._fetch_tasks(
+                completed=True, fields="id,status", updated_min=updated_min
+            )
             google_task_dict = {task['id']: task for task in google_tasks}
             
+            # Get all local tasks that have Google Task IDs (columns only)
+            local_tasks = []
+            if google_task_dict or updated_min is None:
+                local_tasks = db.query(Task).with_entities(
+                    Task.id, Task.google_task_id, Task.status
+                ).filter(
+                    Task.google_task_id.isnot(None)
+                ).all()
+            
+            to_complete_ids = []
+            to_reopen_ids = []
             for local_task in local_tasks:
-                try:
-                    google_task = google_task_dict.get(local_task.google_task_id)
-                    
-                    if google_task:
-                        # Update local task status based on Google Task
-                        if google_task['status'] == 'completed' and local_task.status != TaskStatus.COMPLETED:
-                            local_task.status = TaskStatus.COMPLETED
-                            local_task.completed_at = datetime.utcnow()
-                            stats['synced'] += 1
-                        elif google_task['status'] == 'needsAction' and local_task.status == TaskStatus.COMPLETED:
-                            local_task.status = TaskStatus.PENDING
-                            local_task.completed_at = None
-                            stats['synced'] += 1
-                    else:
-                        # Google task was deleted
-                        logger.warning(f"Google Task {local_task.google_task_id} not found")
-                        
-                except Exception as e:
-                    logger.error(f"Error syncing task {local_task.id}: {e}")
-                    stats['errors'] += 1
+                google_task = google_task_dict.get(local_task.google_task_id)
+                
+                if google_task:
+                    # Update local task status based on Google Task
+                    if google_task['status'] == 'completed' and local_task.status != TaskStatus.COMPLETED:
+                        to_complete_ids.append(local_task.id)
+                    elif google_task['status'] == 'needsAction' and local_task.status == TaskStatus.COMPLETED:
+                        to_reopen_ids.append(local_task.id)
+                elif updated_min is None:
+                    # Google task was deleted (an incremental sync only sees changed tasks)
+                    logger.warning(f"Google Task {local_task.google_task_id} not found")
+            
+            # Apply the changes as bulk UPDATEs instead of per-object flushes
+            completed_at = datetime.utcnow()
+            for task_ids, values in (
+                (to_complete_ids, {Task.status: TaskStatus.COMPLETED, Task.completed_at: completed_at}),
+                (to_reopen_ids, {Task.status: TaskStatus.PENDING, Task.completed_at: None}),
+            ):
+                for chunk_start in range(0, len(task_ids), UPDATE_CHUNK_SIZE):
+                    stats['synced'] += db.query(Task).filter(
+                        Task.id.in_(task_ids[chunk_start:chunk_start + UPDATE_CHUNK_SIZE])
+                    ).update(values, synchronize_session=False)
             
             db.commit()
+            if fetched_all:
+                self._save_last_sync(sync_started)
             logger.info(f"Sync completed: {stats['synced']} synced, {stats['errors']} errors")
             return stats
             
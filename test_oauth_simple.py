@@ -7,9 +7,7 @@ import os
 import sys
 from pathlib import Path
 
-# Add project root to path
 project_root = Path(__file__).parent
-sys.path.insert(0, str(project_root))
 
 def test_oauth():
     """Test OAuth authentication with minimal setup"""
@@ -53,6 +51,9 @@ def test_oauth():
         return False
 
 if __name__ == "__main__":
+    # Add project root to path (already sys.path[0] when run directly)
+    if str(project_root) not in sys.path:
+        sys.path.insert(0, str(project_root))
     if test_oauth():
         print("\n🎉 Google authentication is working!")
         print("You can now run: python test_google_apis.py")
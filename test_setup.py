@@ -3,73 +3,50 @@
 Test script to verify the Daily Medium Writer Agent setup
 """
 
+import importlib
+import io
 import sys
 import os
+from contextlib import redirect_stdout
 from pathlib import Path
 
-# Add project root to path
 project_root = Path(__file__).parent
-sys.path.insert(0, str(project_root))
+
+# (description, module, attribute) checked by test_imports()
+IMPORTS = [
+    ("Config", "config", "settings"),
+    ("Database models", "db.models", "Article"),
+    ("LLM service", "services.llm", "LLMService"),
+    ("Medium service", "services.medium", "MediumService"),
+    ("Topic discovery service", "services.topics", "TopicDiscoveryService"),
+    ("Image generation service", "services.images", "ImageGenerationService"),
+    ("Safety service", "services.safety", "SafetyService"),
+    ("Scheduler service", "services.scheduler", "ArticleGenerationScheduler"),
+]
+
+# Objects imported by test_imports(), by "module.attribute", reused by later tests
+_loaded = {}
+
+
+def _load(module_name, attribute):
+    """Import module_name.attribute once; later calls return the same object"""
+    key = f"{module_name}.{attribute}"
+    if key not in _loaded:
+        _loaded[key] = getattr(importlib.import_module(module_name), attribute)
+    return _loaded[key]
+
 
 def test_imports():
     """Test if all modules can be imported"""
     print("Testing imports...")
     
-    try:
-        from config import settings
-        print("✅ Config imported successfully")
-    except Exception as e:
-        print(f"❌ Config import failed: {e}")
-        return False
-    
-    try:
-        from db.models import Article, Topic, ArticleStatus
-        print("✅ Database models imported successfully")
-    except Exception as e:
-        print(f"❌ Database models import failed: {e}")
-        return False
-    
-    try:
-        from services.llm import LLMService
-        print("✅ LLM service imported successfully")
-    except Exception as e:
-        print(f"❌ LLM service import failed: {e}")
-        return False
-    
-    try:
-        from services.medium import MediumService
-        print("✅ Medium service imported successfully")
-    except Exception as e:
-        print(f"❌ Medium service import failed: {e}")
-        return False
-    
-    try:
-        from services.topics import TopicDiscoveryService
-        print("✅ Topic discovery service imported successfully")
-    except Exception as e:
-        print(f"❌ Topic discovery service import failed: {e}")
-        return False
-    
-    try:
-        from services.images import ImageGenerationService
-        print("✅ Image generation service imported successfully")
-    except Exception as e:
-        print(f"❌ Image generation service import failed: {e}")
-        return False
-    
-    try:
-        from services.safety import SafetyService
-        print("✅ Safety service imported successfully")
-    except Exception as e:
-        print(f"❌ Safety service import failed: {e}")
-        return False
-    
-    try:
-        from services.scheduler import ArticleGenerationScheduler
-        print("✅ Scheduler service imported successfully")
-    except Exception as e:
-        print(f"❌ Scheduler service import failed: {e}")
-        return False
+    for description, module_name, attribute in IMPORTS:
+        try:
+            _load(module_name, attribute)
+            print(f"✅ {description} imported successfully")
+        except Exception as e:
+            print(f"❌ {description} import failed: {e}")
+            return False
     
     return True
 
@@ -107,17 +84,15 @@ def test_database():
     print("\nTesting database...")
     
     try:
-        from db.database import engine, create_tables
-        from sqlalchemy import text
-        
-        # Test connection
-        with engine.connect() as connection:
-            connection.execute(text("SELECT 1"))
-        
-        print("✅ Database connection successful")
-        
-        # Create tables
-        create_tables()
+        from db.database import engine, create_tables, write_schema_marker, PING_QUERY
+        
+        # Test connection, then create tables on the same connection
+        with engine.begin() as connection:
+            connection.execute(PING_QUERY)
+            print("✅ Database connection successful")
+            
+            create_tables(connection)
+        write_schema_marker()  # Only once the DDL has committed
         print("✅ Database tables created/verified")
         
         return True
@@ -131,11 +106,11 @@ def test_services():
     print("\nTesting services...")
     
     try:
-        from services.llm import LLMService
-        from services.medium import MediumService
-        from services.topics import TopicDiscoveryService
-        from services.images import ImageGenerationService
-        from services.safety import SafetyService
+        LLMService = _load("services.llm", "LLMService")
+        MediumService = _load("services.medium", "MediumService")
+        TopicDiscoveryService = _load("services.topics", "TopicDiscoveryService")
+        ImageGenerationService = _load("services.images", "ImageGenerationService")
+        SafetyService = _load("services.safety", "SafetyService")
         
         # Test service initialization
         llm_service = LLMService()
@@ -168,11 +143,11 @@ def test_fastapi():
         print("✅ FastAPI app imported successfully")
         
         # Test if app has expected routes
-        routes = [route.path for route in app.routes]
+        route_paths = {route.path for route in app.routes}
         expected_routes = ["/", "/health", "/review", "/api/articles"]
         
         for route in expected_routes:
-            if route in routes:
+            if route in route_paths:
                 print(f"✅ Route {route} found")
             else:
                 print(f"⚠️  Route {route} not found")
@@ -200,17 +175,22 @@ def main():
     failed = 0
     
     for test_name, test_func in tests:
-        print(f"\n🔍 Running {test_name}...")
-        try:
-            if test_func():
-                passed += 1
-                print(f"✅ {test_name} PASSED")
-            else:
+        # Collect each test's status lines and write them out in one go
+        output = io.StringIO()
+        with redirect_stdout(output):
+            print(f"\n🔍 Running {test_name}...")
+            try:
+                if test_func():
+                    passed += 1
+                    print(f"✅ {test_name} PASSED")
+                else:
+                    failed += 1
+                    print(f"❌ {test_name} FAILED")
+            except Exception as e:
                 failed += 1
-                print(f"❌ {test_name} FAILED")
-        except Exception as e:
-            failed += 1
-            print(f"❌ {test_name} FAILED with exception: {e}")
+                print(f"❌ {test_name} FAILED with exception: {e}")
+        sys.stdout.write(output.getvalue())
+        sys.stdout.flush()
     
     print("\n" + "=" * 60)
     print(f"🧪 Test Results: {passed} passed, {failed} failed")
@@ -229,5 +209,8 @@ def main():
 
 
 if __name__ == "__main__":
+    # Add project root to path (already sys.path[0] when run directly)
+    if str(project_root) not in sys.path:
+        sys.path.insert(0, str(project_root))
     sys.exit(main())
 